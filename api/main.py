@@ -1,18 +1,39 @@
-from fastapi import FastAPI
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from qdrant_client import QdrantClient
 from dotenv import load_dotenv
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
 from scripts.embedder import ST_Embedder
+from scripts.embed_server import RemoteEmbedder
 from scripts.searcher import HybridSearcher
-from scripts.filters import llm_to_filters
+from scripts.filters import llm_to_filters, merge_filters
+from scripts.session_store import HISTORY_TAKE, SessionState, make_session_store
+from scripts.qdrant_utils import QueryFilters, missing_payload_indexes
+from scripts.metrics import RequestTimer, render_prometheus, setup_otel, span
+from scripts.neighbors import NeighborGraphReloader
+from scripts.ratelimit import SingleFlight
+from scripts.vocab import VocabReloader
 
 load_dotenv()
 
-app = FastAPI(title="Araç Satış Asistanı API")
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger("api")
+
+try:  # opsiyonel: yoksa standart json ile aynı çıktı
+    import orjson
+except ImportError:
+    orjson = None
 
 # ======================
 # Request & Response
@@ -20,6 +41,22 @@ app = FastAPI(title="Araç Satış Asistanı API")
 class QueryRequest(BaseModel):
     query: str
     history: List[str] = Field(default_factory=list)
+    session_id: Optional[str] = None   # verilirse history yerine sunucu tarafı session kullanılır
+
+class BatchQueryItem(BaseModel):
+    query: str
+    filters: Optional[QueryFilters] = None   # verilirse LLM filtre çıkarımı atlanır
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchQueryItem] = Field(min_length=1, max_length=20)
+
+class FastJSONResponse(JSONResponse):
+    """orjson ile serileştiren JSONResponse (orjson kurulu değilse Starlette ile aynı json.dumps)."""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
 
 class CarResult(BaseModel):
     yil: Optional[int]
@@ -35,14 +72,87 @@ class CarResult(BaseModel):
 
 
 # ======================
-# Init
+# Init (lifespan içinde; import anında model/istemci yüklenmez)
 # ======================
-client = QdrantClient(url="http://localhost:6333", prefer_grpc=False)
-embedder = ST_Embedder()
-searcher = HybridSearcher(client, "car_listings_st", embedder)
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+COLLECTION = os.getenv("QDRANT_COLLECTION", "car_listings_st")
+EMBEDDER_SOCKET = os.getenv("EMBEDDER_SOCKET")  # ayarlıysa model paylaşımlı embed_server'dadır
+NEIGHBORS_PATH = os.getenv("NEIGHBORS_PATH", "data/neighbors.npz")  # scripts.build_neighbors çıktısı
+NEIGHBORS_CHECK_INTERVAL = float(os.getenv("NEIGHBORS_CHECK_INTERVAL", 30))  # sn; dosya değişikliği kontrolü
+VOCAB_REFRESH_INTERVAL = float(os.getenv("VOCAB_REFRESH_INTERVAL", 600))      # sn; marka/seri/model sözlüğü
 
 TOPIC_THRESHOLD = 0.5
-HISTORY_TAKE = 3
+LLM_BATCH_WORKERS = 8
+
+RESULT_LIMIT = 5     # yanıtta dönen araç sayısı
+WIDE_TOP_K = 100     # sort_by / toleranslı sıralama için aday havuzu
+COUNT_CERTAIN = 3    # tahmini strict sayısı bunun altındaysa (0 dahil) strict + relaxed tek batch
+
+client: Optional[QdrantClient] = None
+embedder = None
+searcher: Optional[HybridSearcher] = None
+sessions = None
+neighbors: Optional[NeighborGraphReloader] = None
+ready = False
+
+# Aynı anda gelen özdeş /search istekleri (query + history + session_id) tek çalıştırmayı paylaşır
+search_flight = SingleFlight("search")
+
+
+def build_client() -> QdrantClient:
+    return QdrantClient(url=QDRANT_URL, prefer_grpc=False)
+
+
+def build_embedder():
+    if EMBEDDER_SOCKET:
+        return RemoteEmbedder(EMBEDDER_SOCKET)
+    return ST_Embedder()
+
+
+def warm_up() -> bool:
+    """
+    Worker'ı trafiğe hazırlar:
+    - Bir encode çağrısı (model ağırlıkları + torch ilk çalıştırma maliyeti)
+    - Qdrant ping (koleksiyon erişilebilir mi?); eksik payload index'i varsa sadece uyarı
+      (index'ler yükleme tarafında oluşturulur: df_to_points / ensure_collection)
+    - Marka/seri/model sözlüğünün ilk yüklemesi (VocabReloader; başarısızsa readiness'i
+      engellemez, key'ler ascii_lower ile çözülür ve sözlük sonraki aralıkta tekrar denenir)
+    """
+    global ready
+    try:
+        embedder.encode(["ısınma sorgusu"])
+        missing = missing_payload_indexes(client, COLLECTION)
+        if missing:
+            logger.warning("Payload index'i eksik alanlar (count / strict filtre yavaş): %s", ", ".join(missing))
+        if searcher.vocab.index is None:
+            searcher.vocab.reload()
+    except Exception as e:
+        logger.warning("Warm-up başarısız: %s", e)
+        ready = False
+    else:
+        ready = True
+    return ready
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, embedder, searcher, sessions, neighbors
+    client = build_client()
+    embedder = build_embedder()
+    searcher = HybridSearcher(client, COLLECTION, embedder, vocab=VocabReloader(client, COLLECTION, VOCAB_REFRESH_INTERVAL))
+    sessions = make_session_store(os.getenv("SESSION_STORE_URL"), ttl=float(os.getenv("SESSION_TTL", 3600)))
+    neighbors = NeighborGraphReloader(NEIGHBORS_PATH, NEIGHBORS_CHECK_INTERVAL)
+    neighbors.reload()
+    setup_otel()
+    warm_up()
+    yield
+    client.close()
+
+
+app = FastAPI(title="Araç Satış Asistanı API", lifespan=lifespan)
+
+
+app.add_middleware(RequestTimer)
 
 
 # ======================
@@ -59,130 +169,306 @@ def is_new_topic(query: str, history: List[str], threshold: float = TOPIC_THRESH
     if not history:
         return False
 
-    q_emb = np.array(embedder.encode([query])[0]).reshape(1, -1)
-    h_embs = np.array(embedder.encode(history[-HISTORY_TAKE:]))
-
-    sims = cosine_similarity(q_emb, h_embs)
+    # Tek encode çağrısı; embedding'ler normalize → kosinüs = iç çarpım
+    embs = np.asarray(embedder.encode([query] + history[-HISTORY_TAKE:]), dtype=np.float32)
+    sims = embs[1:] @ embs[0]
     return float(np.max(sims)) < threshold
 
 
-def in_tolerance(value: Optional[float], target: float, tol: float = 0.05) -> bool:
-    """Değer, hedefin ±%tol aralığında mı?"""
-    if value is None:
-        return False
-    return (target * (1 - tol)) <= value <= (target * (1 + tol))
+def choose_top_k(filters: QueryFilters) -> int:
+    """
+    sort_by veya hedef fiyat/km toleransı Qdrant sırasını değiştirir → geniş aday havuzu gerekir.
+    Aksi halde sonuçlar Qdrant skor sırasıyla döner; ilk RESULT_LIMIT aday yeterlidir.
+    """
+    if filters.sort_by or filters.fiyat_min or filters.fiyat_max or filters.km_min or filters.km_max:
+        return WIDE_TOP_K
+    return RESULT_LIMIT
+
+
+def retrieve(query: str, query_vec, filters: QueryFilters, strict: bool, top_k: int):
+    """
+    Strict → relaxed arama kararı, vektör aramasından önce:
+    - Strict filtre relaxed ile aynıysa (marka/seri/model yok) → tek relaxed arama
+    - Qdrant count tahmini (exact=False, önbellekli) >= COUNT_CERTAIN → sadece strict arama
+    - Tahmin düşükse (0 dahil) belirsiz: tahmin koşulları bağımsız sayıp çarpar, marka/seri/model
+      ise güçlü ilişkili → gerçekte yüzlerce ilan varken 0 çıkabilir. Strict ve relaxed TEK batch
+      istekte aranır, strict boşsa relaxed kullanılır (count + 1 arama, ek round trip yok)
+    """
+    if not (strict and (filters.marka or filters.seri or filters.model)):
+        with span("qdrant_relaxed"):
+            return searcher.search(query, f=filters, top_k=top_k, strict=False, query_vec=query_vec)
+
+    with span("qdrant_count"):
+        n = searcher.count(filters, strict=True)
+
+    if n < COUNT_CERTAIN:
+        with span("qdrant_batch"):
+            strict_res, relaxed_res = searcher.search_batch(
+                [query, query], [filters, filters], top_k=top_k, strict=[True, False],
+                query_vecs=[query_vec, query_vec],
+            )
+        if not strict_res:
+            logger.info("Strict filtreye uyan ilan yok, strict=False sonuçları kullanılıyor")
+        return strict_res or relaxed_res
+
+    with span("qdrant_strict"):
+        results = searcher.search(query, f=filters, top_k=top_k, strict=True, query_vec=query_vec)
+    if results:
+        return results
+    logger.info("Strict aramada sonuç çıkmadı, fallback strict=False")
+    with span("qdrant_fallback"):
+        return searcher.search(query, f=filters, top_k=top_k, strict=False, query_vec=query_vec)
+
+
+def resolve_session_turn(session_id: str, query: str):
+    """
+    Session modunda konu algılama + filtre çıkarımı:
+    - Sorgu bir kez encode edilir, saklı tur embedding'leriyle tek çarpımla kıyaslanır
+    - LLM'e sadece yeni mesaj gider, sonuç saklı filtrelerin üzerine birleştirilir
+    - Embedding ve LLM dışarıda; okuma → birleştirme → yazma sessions.update ile atomik
+      (aynı session'a eşzamanlı iki tur, paylaşımlı backend'de farklı worker'lardan da, birbirini ezmez)
+    Returns: (filtreler, sorgu vektörü)
+    """
+    with span("embed"):
+        q_emb = embedder.embed_query(query)
+
+    with span("llm_filters"):
+        new_filters = llm_to_filters(query)
+
+    def apply_turn(state: SessionState):
+        sim = state.max_similarity(q_emb)
+        if sim is not None and sim < TOPIC_THRESHOLD:
+            state.reset()
+        state.add_turn(q_emb, merge_filters(state.filters, new_filters), max_turns=HISTORY_TAKE)
+
+    with span("topic"):
+        state = sessions.update(session_id, apply_turn)
+    return state.filters, q_emb
+
+
+def to_car_result(pl: dict) -> CarResult:
+    """Qdrant payload → CarResult (markdown açıklama dahil)."""
+    fiyat = pl.get("fiyat")
+    km = pl.get("kilometre")
+    yil = pl.get("yil")
+    marka = pl.get("marka")
+    model = pl.get("model")
+    seri = pl.get("seri")
+
+    fiyat_str = f"{fiyat:,}".replace(",", ".") if fiyat else "bilinmiyor"
+    km_str = f"{int(km):,}".replace(",", ".") if km else "bilinmiyor"
+
+    desc = (
+        f"**{yil or '—'} model {marka or '—'} {model or ''} {seri or ''}**\n"
+        f"- Fiyat: {fiyat_str} TL\n"
+        f"- Kilometre: {km_str} km\n"
+        f"- Yakıt: {pl.get('yakit_tipi', 'bilinmiyor')}\n"
+        f"- Vites: {pl.get('vites_tipi', 'bilinmiyor')}\n"
+        f"- 👉 [İlana Git]({pl.get('url')})"
+    )
+
+    return CarResult(
+        yil=yil,
+        marka=marka,
+        seri=seri,
+        model=model,
+        fiyat=fiyat,
+        kilometre=km,
+        yakit_tipi=pl.get("yakit_tipi"),
+        vites_tipi=pl.get("vites_tipi"),
+        url=pl.get("url"),
+        description=desc
+    )
+
+
+def _as_float(x) -> float:
+    """Payload değeri → float (CarResult'taki gibi sayısal string'ler de); yoksa NaN."""
+    if x is None:
+        return np.nan
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _target(lo: Optional[float], hi: Optional[float]) -> Optional[float]:
+    """Tek sınır verildiyse o, iki sınır verildiyse ortası."""
+    if hi and not lo:
+        return hi
+    if lo and not hi:
+        return lo
+    if lo and hi:
+        return (lo + hi) / 2
+    return None
+
+
+def _tolerance_keys(v: np.ndarray, target: float, tol: float = 0.05):
+    """(hedefin ±%tol dışında mı, hedefe uzaklık) anahtarları; eksik/0 değer → (1, inf)."""
+    inside = (target * (1 - tol) <= v) & (v <= target * (1 + tol))   # NaN → False
+    present = ~np.isnan(v) & (v != 0)
+    dist = np.where(present, np.abs(np.where(present, v, 0.0) - target), np.inf)
+    return (~inside).astype(np.int8), dist
+
+
+def rank_order(payloads: List[dict], filters: QueryFilters) -> List[int]:
+    """
+    Aday sırası (indeksler); sort_by veya hedef fiyat/km toleransına göre.
+    Sıralama payload'lardan çıkarılan numpy kolonları üzerinde, kararlı (stable):
+    - sort_by: değer (eksik → 0) artan / azalan
+    - tolerans: önce km (tolerans içinde mi, uzaklık), eşitlikte fiyat; ikisi de yoksa Qdrant sırası
+    """
+    n = len(payloads)
+    sort_by = getattr(filters, "sort_by", None)
+    target_price = _target(filters.fiyat_min, filters.fiyat_max)
+    target_km = _target(filters.km_min, filters.km_max)
+    if n < 2 or not (sort_by or target_price or target_km):
+        return list(range(n))
+
+    def col(field: str) -> np.ndarray:
+        return np.fromiter((_as_float(pl.get(field)) for pl in payloads), dtype=np.float64, count=n)
+
+    # 1) sort_by varsa → direk onu uygula
+    if sort_by:
+        field, _, direction = sort_by.rpartition("_")
+        field = {"fiyat": "fiyat", "yil": "yil", "km": "kilometre"}.get(field)
+        if field is None or direction not in ("asc", "desc"):
+            return list(range(n))
+        v = np.nan_to_num(col(field), nan=0.0)
+        return np.argsort(-v if direction == "desc" else v, kind="stable").tolist()
+
+    # 2) Toleranslı sıralama: lexsort'ta son anahtar birincil
+    keys = []
+    if target_price:
+        flag, dist = _tolerance_keys(col("fiyat"), target_price)
+        keys += [dist, flag]
+    if target_km:
+        flag, dist = _tolerance_keys(col("kilometre"), target_km)
+        keys += [dist, flag]
+    return np.lexsort(keys).tolist()
+
+
+def rank_results(results: List[Tuple[str, float, dict]], filters: QueryFilters, limit: int = RESULT_LIMIT) -> List[dict]:
+    """Qdrant sonuçlarını sıralar; sadece ilk limit aday CarResult'a çevrilip yanıt sözlüğü olur."""
+    payloads = [pl for _, _, pl in results]
+    return [to_car_result(payloads[i]).model_dump() for i in rank_order(payloads, filters)[:limit]]
 
 
 # ======================
 # Endpoint
 # ======================
+@app.get("/ready")
+def readiness():
+    """Readiness probe: warm-up tamamlanmadıysa (veya Qdrant erişilemezse) 503."""
+    if ready or (searcher is not None and warm_up()):
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content={"status": "starting"})
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (aşama süreleri, istek süreleri, LLM token sayıları)."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/search", response_model=List[CarResult])
 def search(req: QueryRequest):
-    # 1) Konu algılama
-    history = req.history or []
-    if is_new_topic(req.query, history):
-        history = []
+    # Çift tıklama / retry fırtınası: devam eden özdeş istek varsa onun sonucunu bekle
+    key = (req.query, tuple(req.history or ()), req.session_id)
+    cars = search_flight.do(key, lambda: run_search(req))
+    with span("serialize"):
+        return FastJSONResponse(cars)
+
 
-    # 2) LLM filtreleri
-    contextual_query = f"Kullanıcı geçmişi: {history}. Yeni mesaj: {req.query}"
-    filters = llm_to_filters(contextual_query)
+def run_search(req: QueryRequest) -> List[dict]:
+    query_vec = None
+    if req.session_id:
+        # 1-2) Session: konu algılama + yeni mesajın filtrelerini saklı filtrelere ekle
+        filters, query_vec = resolve_session_turn(req.session_id, req.query)
+    else:
+        # 1) Konu algılama
+        history = req.history or []
+        with span("topic"):
+            if is_new_topic(req.query, history):
+                history = []
+
+        # 2) LLM filtreleri
+        contextual_query = f"Kullanıcı geçmişi: {history}. Yeni mesaj: {req.query}"
+        with span("llm_filters"):
+            filters = llm_to_filters(contextual_query)
 
     # 3) Strict mode
     strict = detect_strict_mode(req.query)
 
-    # 4) Qdrant araması (yüksek top_k → daha fazla aday araç)
+    # 4) Qdrant araması (top_k sıralama ihtiyacına göre; strict/relaxed kararı count ile)
     search_text = req.query
-    results = searcher.search(search_text, f=filters, top_k=100, strict=strict)
-
-    if not results:
-        print("⚠️ Strict aramada sonuç çıkmadı, fallback strict=False")
-        results = searcher.search(search_text, f=filters, top_k=100, strict=False)
-
-    # 5) Kullanıcının hedef fiyat ve km
-    target_price = None
-    target_km = None
-
-    if filters.fiyat_max and not filters.fiyat_min:
-        target_price = filters.fiyat_max
-    elif filters.fiyat_min and not filters.fiyat_max:
-        target_price = filters.fiyat_min
-    elif filters.fiyat_min and filters.fiyat_max:
-        target_price = (filters.fiyat_min + filters.fiyat_max) / 2
-
-    if filters.km_max and not filters.km_min:
-        target_km = filters.km_max
-    elif filters.km_min and not filters.km_max:
-        target_km = filters.km_min
-    elif filters.km_min and filters.km_max:
-        target_km = (filters.km_min + filters.km_max) / 2
-
-    # 6) Sonuçları dönüştür
-    cars: List[CarResult] = []
-    for _, _, pl in results:
-        fiyat = pl.get("fiyat")
-        km = pl.get("kilometre")
-        yil = pl.get("yil")
-        marka = pl.get("marka")
-        model = pl.get("model")
-        seri = pl.get("seri")
-
-        fiyat_str = f"{fiyat:,}".replace(",", ".") if fiyat else "bilinmiyor"
-        km_str = f"{int(km):,}".replace(",", ".") if km else "bilinmiyor"
-
-        desc = (
-            f"**{yil or '—'} model {marka or '—'} {model or ''} {seri or ''}**\n"
-            f"- Fiyat: {fiyat_str} TL\n"
-            f"- Kilometre: {km_str} km\n"
-            f"- Yakıt: {pl.get('yakit_tipi', 'bilinmiyor')}\n"
-            f"- Vites: {pl.get('vites_tipi', 'bilinmiyor')}\n"
-            f"- 👉 [İlana Git]({pl.get('url')})"
-        )
-
-        cars.append(CarResult(
-            yil=yil,
-            marka=marka,
-            seri=seri,
-            model=model,
-            fiyat=fiyat,
-            kilometre=km,
-            yakit_tipi=pl.get("yakit_tipi"),
-            vites_tipi=pl.get("vites_tipi"),
-            url=pl.get("url"),
-            description=desc
-        ))
-
-    # 7) Eğer sort_by varsa → direk onu uygula
-    if hasattr(filters, "sort_by") and filters.sort_by:
-        if filters.sort_by == "fiyat_desc":
-            cars = sorted(cars, key=lambda c: c.fiyat or 0, reverse=True)
-        elif filters.sort_by == "fiyat_asc":
-            cars = sorted(cars, key=lambda c: c.fiyat or 0)
-        elif filters.sort_by == "yil_desc":
-            cars = sorted(cars, key=lambda c: c.yil or 0, reverse=True)
-        elif filters.sort_by == "yil_asc":
-            cars = sorted(cars, key=lambda c: c.yil or 0)
-        elif filters.sort_by == "km_desc":
-            cars = sorted(cars, key=lambda c: c.kilometre or 0, reverse=True)
-        elif filters.sort_by == "km_asc":
-            cars = sorted(cars, key=lambda c: c.kilometre or 0)
-    else:
-        # 8) sort_by yoksa → toleranslı sıralama uygula
-        if target_price:
-            cars = sorted(
-                cars,
-                key=lambda c: (
-                    0 if in_tolerance(c.fiyat, target_price, tol=0.05) else 1,
-                    abs((c.fiyat or 0) - target_price) if c.fiyat else float("inf")
-                )
-            )
-        if target_km:
-            cars = sorted(
-                cars,
-                key=lambda c: (
-                    0 if in_tolerance(c.kilometre, target_km, tol=0.05) else 1,
-                    abs((c.kilometre or 0) - target_km) if c.kilometre else float("inf")
-                )
+    if query_vec is None:
+        with span("embed"):
+            query_vec = embedder.embed_query(search_text)
+
+    results = retrieve(search_text, query_vec, filters, strict, choose_top_k(filters))
+
+    # 5-8) Sırala; 🔑 sadece en uygun RESULT_LIMIT araç yanıt nesnesine çevrilir
+    with span("rerank"):
+        return rank_results(results, filters)
+
+
+@app.post("/search/batch", response_model=List[List[CarResult]])
+def search_batch(req: BatchQueryRequest):
+    """
+    Karşılaştırma ("Astra mı Focus mu?") ve "benzer araçlar" gibi çoklu aramalar:
+    tek encode + tek Qdrant batch isteği. Sonuçlar sorgu sırasıyla döner.
+    """
+    queries = [item.query for item in req.queries]
+
+    # 1) Filtreler: verilmeyenler için LLM çağrıları paralel
+    filters: List[Optional[QueryFilters]] = [item.filters for item in req.queries]
+    missing = [i for i, f in enumerate(filters) if f is None]
+    if missing:
+        with span("llm_filters"), ThreadPoolExecutor(min(LLM_BATCH_WORKERS, len(missing))) as ex:
+            for i, f in zip(missing, ex.map(llm_to_filters, [queries[i] for i in missing])):
+                filters[i] = f
+
+    # 2) Strict mode (sorgu başına)
+    stricts = [detect_strict_mode(q) for q in queries]
+
+    # 3) Tek encode
+    with span("embed"):
+        query_vecs = embedder.embed_documents(queries)
+
+    # 4) Tek Qdrant batch isteği (her sorgu kendi top_k'sıyla)
+    top_ks = [choose_top_k(f) for f in filters]
+    with span("qdrant_multi"):
+        results = searcher.search_batch(queries, filters, top_k=top_ks, strict=stricts, query_vecs=query_vecs)
+
+    # Strict aranıp sonuçsuz kalanlar → tek fallback batch (strict=False);
+    # zaten relaxed aranmış olanları aynı sorguyla tekrar aramanın anlamı yok
+    empty = [i for i, r in enumerate(results) if not r and stricts[i]]
+    if empty:
+        logger.info("Batch: %d sorgu sonuçsuz, fallback strict=False", len(empty))
+        with span("qdrant_fallback"):
+            retry = searcher.search_batch(
+                [queries[i] for i in empty], [filters[i] for i in empty],
+                top_k=[top_ks[i] for i in empty], strict=False, query_vecs=[query_vecs[i] for i in empty],
             )
+        for i, r in zip(empty, retry):
+            results[i] = r
+
+    # 5) Sırala + ilk RESULT_LIMIT'i dönüştür
+    with span("rerank"):
+        ranked = [rank_results(r, f) for r, f in zip(results, filters)]
+
+    with span("serialize"):
+        return FastJSONResponse(ranked)
+
 
-    # 🔑 sadece en uygun 5 aracı döndür
-    return cars[:5]
+@app.get("/similar/{listing_id}", response_model=List[CarResult])
+def similar(listing_id: str, limit: int = Query(5, ge=1, le=20)):
+    """"Bu araca benzer": önceden hesaplanmış komşu grafiğinden (LLM / Qdrant çağrısı yok)."""
+    graph = neighbors.get() if neighbors is not None else None
+    if graph is None:
+        raise HTTPException(status_code=503, detail="Komşu grafiği yüklü değil (scripts.build_neighbors)")
+    with span("similar"):
+        hits = graph.neighbors(listing_id, limit=limit)
+    if hits is None:
+        raise HTTPException(status_code=404, detail=f"İlan bulunamadı: {listing_id}")
+    return FastJSONResponse([to_car_result(pl).model_dump() for _, _, pl in hits])
@@ -0,0 +1,116 @@
+# scripts/bench_metrics.py
+"""
+Metrik Overhead Benchmark'ı
+- span() context manager'ının çağrı başına maliyetini boş döngüyle kıyaslar
+- Eşzamanlı thread'lerde (kilit çekişmesi) maliyeti ölçer
+- /metrics çıktısının üretim süresini ölçer
+- RequestTimer middleware'inin istek başına maliyetini ölçer (aynı app, middleware'li / middleware'siz)
+- Bir /search isteğindeki ~8 span'in toplam maliyetini raporlar
+
+Kullanım:
+    python -m scripts.bench_metrics --n 200000 --threads 8
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.metrics import Histogram, RequestTimer, render_prometheus, span
+
+SPANS_PER_REQUEST = 7  # topic, llm_filters, embed, qdrant_*, rerank, serialize (+ RequestTimer ayrı ölçülür)
+
+
+def per_call_ns(fn, n: int) -> float:
+    t0 = time.perf_counter_ns()
+    fn(n)
+    return (time.perf_counter_ns() - t0) / n
+
+
+def empty_loop(n: int):
+    for _ in range(n):
+        pass
+
+
+def span_loop(n: int):
+    for _ in range(n):
+        with span("bench"):
+            pass
+
+
+def asgi_request_ns(with_timer: bool, n: int) -> float:
+    """Ağsız, doğrudan ASGI çağrısıyla tek bir GET isteğinin ortalama süresi (ns)."""
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.get("/ping/{x}")
+    def ping(x: str):
+        return {"x": x}
+
+    if with_timer:
+        app.add_middleware(RequestTimer)
+
+    scope = {"type": "http", "method": "GET", "path": "/ping/1", "raw_path": b"/ping/1", "root_path": "",
+             "query_string": b"", "headers": [], "scheme": "http", "server": ("bench", 80), "http_version": "1.1"}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def loop():
+        for _ in range(n // 10):  # ısınma
+            await app(dict(scope), receive, send)
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            await app(dict(scope), receive, send)
+        return (time.perf_counter_ns() - t0) / n
+
+    return asyncio.run(loop())
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args()
+
+    # 1) Tek thread
+    base = per_call_ns(empty_loop, args.n)
+    with_span = per_call_ns(span_loop, args.n)
+    cost = with_span - base
+    print(f"\n⏱️ span() maliyeti: {cost:.0f} ns/çağrı (boş döngü {base:.0f} ns, span'li {with_span:.0f} ns)")
+
+    # 2) Eşzamanlı (kilit çekişmesi)
+    per_thread = args.n // args.threads
+    t0 = time.perf_counter_ns()
+    with ThreadPoolExecutor(args.threads) as ex:
+        list(ex.map(span_loop, [per_thread] * args.threads))
+    contended = (time.perf_counter_ns() - t0) / (per_thread * args.threads)
+    print(f"🧵 {args.threads} thread: {contended:.0f} ns/çağrı (duvar saati, GIL dahil)")
+
+    # 3) /metrics render
+    h = Histogram("bench_render_seconds", "render benchmark")
+    for i in range(50):
+        h.observe(0.01, stage=f"s{i}")
+    t0 = time.perf_counter()
+    for _ in range(100):
+        render_prometheus()
+    print(f"📄 /metrics render: {(time.perf_counter() - t0) * 10:.2f} ms/scrape")
+
+    # 4) RequestTimer middleware (her istekte çalışır)
+    n_req = max(1000, args.n // 20)
+    plain = asgi_request_ns(False, n_req)
+    timed = asgi_request_ns(True, n_req)
+    mw_cost = timed - plain
+    print(f"🌐 RequestTimer: {mw_cost / 1000:.1f} µs/istek (middleware'siz {plain / 1000:.1f} µs, "
+          f"middleware'li {timed / 1000:.1f} µs)")
+
+    # 5) İstek başına toplam
+    total = SPANS_PER_REQUEST * cost + mw_cost
+    print(
+        f"✅ İstek başına ~{SPANS_PER_REQUEST} span + middleware ≈ {total / 1000:.1f} µs "
+        f"(tipik /search > 100 ms → %{total / 1e6:.4f})"
+    )
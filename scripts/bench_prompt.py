@@ -0,0 +1,155 @@
+# scripts/bench_prompt.py
+"""
+Prompt Benchmark
+- Tipik sorgular için recommend_text ve format_car_results_stream prompt'larının
+  token sayısını eski (json.dumps / etiketli satır) ve yeni (kompakt tablo) formatta ölçer
+- OPENAI_API_KEY varsa her iki format için time-to-first-token (TTFT) ölçer
+
+Kullanım:
+    python -m scripts.bench_prompt                 # sadece token sayıları
+    python -m scripts.bench_prompt --ttft --runs 5 # + TTFT (canlı OpenAI çağrısı)
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from scripts.compact import compact_candidates, count_tokens
+from scripts.recommend import SYSTEM as RECOMMEND_SYSTEM
+
+
+QUERIES = [
+    "İstanbul’da 1.3 milyon TL’ye kadar 2018 sonrası otomatik benzinli Astra",
+    "Ailem için 700 bin altı dizel SUV",
+    "En ucuz otomatik Clio",
+    "100 bin km altı 2020 sonrası Corolla hibrit",
+    "Focus'a benzer alternatif bir araç",
+]
+
+CATALOG = [
+    ("Opel", "Astra", "1.4 Turbo Enjoy", "Benzin"),
+    ("Ford", "Focus", "1.5 TDCi Trend X", "Dizel"),
+    ("Renault", "Clio", "1.0 TCe Touch", "Benzin"),
+    ("Toyota", "Corolla", "1.8 Hybrid Flame X-Pack", "Hibrit"),
+    ("Volkswagen", "Tiguan", "1.5 TSI Life", "Benzin"),
+    ("Hyundai", "Tucson", "1.6 CRDi Elite", "Dizel"),
+    ("Fiat", "Egea", "1.3 Multijet Easy", "Dizel"),
+]
+CITIES = ["Karşıyaka Mh. Kepez, Antalya", "Kadıköy, İstanbul", "Çankaya, Ankara", "Nilüfer, Bursa"]
+
+
+# ============================
+# Örnek aday üretici (tekrarlı ilanlar dahil)
+# ============================
+def sample_candidates(n: int = 20, seed: int = 42) -> List[Dict]:
+    rnd = random.Random(seed)
+    cars: List[Dict] = []
+    while len(cars) < n:
+        marka, seri, model, yakit = rnd.choice(CATALOG)
+        car = {
+            "id": 10_000_000 + len(cars),
+            "yil": rnd.randint(2014, 2023),
+            "marka": marka,
+            "seri": seri,
+            "model": model,
+            "fiyat": float(rnd.randrange(550_000, 1_900_000, 5_000)),
+            "kilometre": float(rnd.randrange(5_000, 220_000, 1_000)),
+            "yakit_tipi": yakit,
+            "vites_tipi": rnd.choice(["Otomatik", "Manuel", "Yarı Otomatik"]),
+            "konum": rnd.choice(CITIES),
+        }
+        car["url"] = f"https://www.arabam.com/ilan/galeriden-satilik-{marka.lower()}-{seri.lower()}/{car['id']}"
+        cars.append(car)
+        # Aynı ilanın farklı galerilerden tekrar yayınlanması
+        if rnd.random() < 0.25 and len(cars) < n:
+            dup = dict(car, id=car["id"] + 1, fiyat=car["fiyat"] + 2_500)
+            dup["url"] = car["url"].rsplit("/", 1)[0] + f"/{dup['id']}"
+            cars.append(dup)
+    return cars
+
+
+# ============================
+# Eski (sıkıştırma öncesi) prompt gövdeleri
+# ============================
+def legacy_recommend_candidates(cars: List[Dict]) -> str:
+    cands = [{"marka": c.get("marka"), "seri": c.get("seri"), "model": c.get("model"), "yil": c.get("yil"),
+              "km": c.get("kilometre"), "fiyat": c.get("fiyat"), "url": c.get("url")} for c in cars[:20]]
+    return json.dumps(cands, ensure_ascii=False)
+
+
+def legacy_formatter_cars(cars: List[Dict]) -> str:
+    return "\n\n".join([
+        f"- {car.get('yil', '—')} model {car.get('marka', '—')} {car.get('seri','')} {car.get('model','')} | "
+        f"Fiyat: {car.get('fiyat','bilinmiyor')} TL | "
+        f"Kilometre: {car.get('kilometre','bilinmiyor')} km | "
+        f"Yakıt: {car.get('yakit_tipi','bilinmiyor')} | "
+        f"Vites: {car.get('vites_tipi','bilinmiyor')} | "
+        f"URL: {car.get('url','')}"
+        for car in cars
+    ])
+
+
+# ============================
+# TTFT ölçümü
+# ============================
+def measure_ttft(system: str, human: str, model: str, runs: int) -> float:
+    from langchain_openai import ChatOpenAI
+
+    llm = ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), model=model, temperature=0, streaming=True)
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        for chunk in llm.stream([{"role": "system", "content": system}, {"role": "user", "content": human}]):
+            if chunk.content:
+                samples.append(time.perf_counter() - t0)
+                break
+    return statistics.median(samples) if samples else float("nan")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ttft", action="store_true", help="Canlı OpenAI çağrısıyla TTFT ölç")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--model", default="gpt-4o-mini")
+    args = ap.parse_args()
+
+    cars20 = sample_candidates(20)
+    cars5 = cars20[:5]
+
+    # 1) Token sayıları
+    print(f"\n📏 Prompt token sayıları (model={args.model})\n")
+    print(f"{'sorgu':<45} {'recommend eski':>15} {'yeni':>6} {'formatter eski':>15} {'yeni':>6}")
+    totals = [0, 0, 0, 0]
+    prompts = []
+    for q in QUERIES:
+        rec_old = f"{RECOMMEND_SYSTEM}\nSorgu: {q}\nAdaylar: {legacy_recommend_candidates(cars20)}"
+        rec_new_c, _ = compact_candidates(cars20, model=args.model)
+        rec_new = f"{RECOMMEND_SYSTEM}\nSorgu: {q}\nAdaylar:\n{rec_new_c}"
+        fmt_old = f"Kullanıcının sorgusu: {q}\n\nAday araçlar:\n{legacy_formatter_cars(cars5)}"
+        fmt_new_c, _ = compact_candidates(cars5, model=args.model)
+        fmt_new = f"Kullanıcının sorgusu: {q}\n\nAday araçlar:\n{fmt_new_c}"
+
+        counts = [count_tokens(p, args.model) for p in (rec_old, rec_new, fmt_old, fmt_new)]
+        totals = [a + b for a, b in zip(totals, counts)]
+        prompts.append((rec_old, rec_new))
+        print(f"{q[:44]:<45} {counts[0]:>15} {counts[1]:>6} {counts[2]:>15} {counts[3]:>6}")
+
+    print(
+        f"\n✅ recommend: {totals[0]} → {totals[1]} token (-%{100 * (1 - totals[1] / totals[0]):.1f}) | "
+        f"formatter: {totals[2]} → {totals[3]} token (-%{100 * (1 - totals[3] / totals[2]):.1f})"
+    )
+
+    # 2) TTFT (opsiyonel)
+    if args.ttft:
+        if not os.getenv("OPENAI_API_KEY"):
+            print("⚠️ OPENAI_API_KEY yok, TTFT ölçümü atlandı.")
+        else:
+            print(f"\n⏱️ Time-to-first-token (medyan, {args.runs} tekrar)\n")
+            for q, (rec_old, rec_new) in zip(QUERIES, prompts):
+                old = measure_ttft("", rec_old, args.model, args.runs)
+                new = measure_ttft("", rec_new, args.model, args.runs)
+                print(f"{q[:44]:<45} eski: {old * 1000:7.1f} ms | yeni: {new * 1000:7.1f} ms")
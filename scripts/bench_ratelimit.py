@@ -0,0 +1,139 @@
+# scripts/bench_ratelimit.py
+"""
+Yük Testi: İstek Birleştirme + LLM Hız Sınırı + Degrade Mod (offline)
+- bench_search ile aynı offline ortam (in-memory Qdrant + HashingEmbedder)
+- Gerçek llm_to_filters yolu çalışır; sadece LLM zinciri stub'dır:
+    her çağrıda --llm-latency ms gecikme, --p429 olasılıkla 429 hatası
+- Patlamalı trafik: her dalgada aynı sorgu --dup kez eşzamanlı gönderilir
+- Raporlar: istek / gerçek LLM çağrısı, birleştirilen istek, 429 yeniden denemeleri,
+  degrade yanıtlar, 5xx sayısı, p50/p95 gecikme
+
+Kullanım:
+    python -m scripts.bench_ratelimit
+    python -m scripts.bench_ratelimit --p429 0.5 --rps 2 --waves 10 --dup 16
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BENCH_DIR = os.path.join(PROJECT_ROOT, "bench")
+
+
+class StubRateLimitError(Exception):
+    """openai.RateLimitError yerine (status_code=429)."""
+
+    status_code = 429
+
+
+class StubMessage:
+    def __init__(self, content: str):
+        self.content = content
+        self.usage_metadata = {"input_tokens": 400, "output_tokens": 40}
+
+
+class StubChain:
+    """prompt | llm yerine: gecikme + olasılıklı 429, kayıtlı filtre JSON'u döndürür."""
+
+    def __init__(self, recorded: dict, latency: float, p429: float):
+        self.recorded = recorded
+        self.latency = latency
+        self.p429 = p429
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, inputs: dict):
+        with self._lock:
+            self.calls += 1
+            fail = random.random() < self.p429
+            self.errors += fail
+        time.sleep(self.latency)
+        if fail:
+            raise StubRateLimitError("Rate limit reached (stub)")
+        key = inputs["query"].split("Yeni mesaj: ", 1)[-1]
+        return StubMessage(json.dumps(self.recorded.get(key, {})))
+
+
+class StubParser:
+    def parse(self, content: str):
+        from scripts.filters import FilterSpec
+        return FilterSpec.model_validate_json(content)
+
+
+def counter_total(counter, **match) -> float:
+    return sum(v for k, v in counter._series.items() if all((a, b) in k for a, b in match.items()))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", default=os.path.join(BENCH_DIR, "queries.json"))
+    ap.add_argument("--data", default=os.path.join(BENCH_DIR, "sample_listings.parquet"))
+    ap.add_argument("--waves", type=int, default=5, help="dalga sayısı (her dalga tüm korpus)")
+    ap.add_argument("--dup", type=int, default=8, help="dalgada her sorgunun eşzamanlı kopya sayısı")
+    ap.add_argument("--llm-latency", type=float, default=300, help="stub LLM gecikmesi (ms)")
+    ap.add_argument("--p429", type=float, default=0.3, help="stub LLM 429 olasılığı")
+    ap.add_argument("--rps", type=float, default=5, help="LLM_RPS")
+    ap.add_argument("--burst", type=float, default=10, help="LLM_BURST")
+    ap.add_argument("--concurrency", type=int, default=4, help="LLM_MAX_CONCURRENCY")
+    ap.add_argument("--max-wait", type=float, default=1.0, help="LLM_MAX_WAIT (sn)")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["LLM_RPS"] = str(args.rps)
+    os.environ["LLM_BURST"] = str(args.burst)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["LLM_MAX_WAIT"] = str(args.max_wait)
+    sys.path.insert(0, PROJECT_ROOT)
+    from fastapi.testclient import TestClient
+
+    import api.main as main
+    import scripts.filters as filters
+    from scripts.bench_search import install_stubs, load_fixtures
+    from scripts.metrics import COALESCED, LLM_EVENTS
+
+    fixtures = load_fixtures(args.queries)
+    install_stubs(main, fixtures, args.data, use_st=False)
+
+    # LLM yolu gerçek (limiter + degrade), sadece zincir stub
+    chain = StubChain({fx["query"]: fx["filters"] for fx in fixtures}, args.llm_latency / 1000, args.p429)
+    filters._build_chain = lambda model, api_key: (chain, StubParser(), "")
+    main.llm_to_filters = filters.llm_to_filters
+
+    jobs = [fx["query"] for fx in fixtures]
+    lat, statuses = [], []
+
+    def one(q: str):
+        t0 = time.perf_counter()
+        r = tc.post("/search", json={"query": q, "history": []})
+        return (time.perf_counter() - t0) * 1000, r.status_code
+
+    with TestClient(main.app, raise_server_exceptions=False) as tc:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(len(jobs) * args.dup) as ex:
+            for _ in range(args.waves):
+                wave = [q for q in jobs for _ in range(args.dup)]
+                random.shuffle(wave)
+                for ms, status in ex.map(one, wave):
+                    lat.append(ms)
+                    statuses.append(status)
+        elapsed = time.perf_counter() - t0
+
+    n = len(statuses)
+    print(f"\n🚦 {args.waves} dalga × {len(jobs)} sorgu × {args.dup} kopya = {n} istek ({elapsed:.1f} sn)\n")
+    print(f"  gerçek LLM çağrısı      : {chain.calls}  (enjekte 429: {chain.errors})")
+    print(f"  birleştirilen istek     : {int(counter_total(COALESCED, name='search'))}")
+    print(f"  429 yeniden deneme      : {int(counter_total(LLM_EVENTS, event='retry_429'))}")
+    for ev in ("rate_limited", "queue_full", "budget_exceeded", "degraded_cache", "degraded_rules"):
+        print(f"  {ev:<24}: {int(counter_total(LLM_EVENTS, event=ev))}")
+    print(f"  5xx                     : {sum(1 for s in statuses if s >= 500)}")
+    print(f"  p50={np.percentile(lat, 50):.0f} ms  p95={np.percentile(lat, 95):.0f} ms  qps={n / elapsed:.1f}")
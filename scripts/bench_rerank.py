@@ -0,0 +1,124 @@
+# scripts/bench_rerank.py
+"""
+Retrieval Sonrası CPU Mikrobenchmark'ı (offline)
+- Qdrant sonrası aşamayı (sıralama + yanıt nesneleri + JSON) izole ölçer
+- Eski yol: tüm adaylar için CarResult + açıklama, Python sorted, ilk 5 → JSONResponse
+- Yeni yol: numpy kolonlarında kararlı sıralama, sadece ilk 5 → CarResult, FastJSONResponse (orjson)
+- Her senaryoda iki yolun yanıt gövdelerinin (JSON olarak) aynı olduğu doğrulanır
+
+Kullanım:
+    python -m scripts.bench_rerank
+    python -m scripts.bench_rerank --iters 5000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BENCH_DIR = os.path.join(PROJECT_ROOT, "bench")
+
+
+# ============================
+# Eski yol (karşılaştırma için)
+# ============================
+def legacy_in_tolerance(value: Optional[float], target: float, tol: float = 0.05) -> bool:
+    if value is None:
+        return False
+    return (target * (1 - tol)) <= value <= (target * (1 + tol))
+
+
+def legacy_rank(main, results, filters) -> List:
+    target_price = main._target(filters.fiyat_min, filters.fiyat_max)
+    target_km = main._target(filters.km_min, filters.km_max)
+
+    cars = [main.to_car_result(pl) for _, _, pl in results]
+    if filters.sort_by:
+        field, _, direction = filters.sort_by.rpartition("_")
+        attr = {"fiyat": "fiyat", "yil": "yil", "km": "kilometre"}[field]
+        cars = sorted(cars, key=lambda c: getattr(c, attr) or 0, reverse=direction == "desc")
+    else:
+        if target_price:
+            cars = sorted(cars, key=lambda c: (
+                0 if legacy_in_tolerance(c.fiyat, target_price) else 1,
+                abs((c.fiyat or 0) - target_price) if c.fiyat else float("inf"),
+            ))
+        if target_km:
+            cars = sorted(cars, key=lambda c: (
+                0 if legacy_in_tolerance(c.kilometre, target_km) else 1,
+                abs((c.kilometre or 0) - target_km) if c.kilometre else float("inf"),
+            ))
+    return cars
+
+
+def legacy_path(main, results, filters) -> bytes:
+    cars = legacy_rank(main, results, filters)
+    return main.JSONResponse([c.model_dump() for c in cars[: main.RESULT_LIMIT]]).body
+
+
+def lean_path(main, results, filters) -> bytes:
+    return main.FastJSONResponse(main.rank_results(results, filters)).body
+
+
+# ============================
+# Ölçüm
+# ============================
+def cpu_us(fn, iters: int) -> float:
+    """İstek başına CPU süresi (µs, process_time)."""
+    t0 = time.process_time()
+    for _ in range(iters):
+        fn()
+    return (time.process_time() - t0) / iters * 1e6
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=os.path.join(BENCH_DIR, "sample_listings.parquet"))
+    ap.add_argument("--iters", type=int, default=2000)
+    args = ap.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, PROJECT_ROOT)
+    import pandas as pd
+
+    import api.main as main
+    from scripts.normalize import normalize_df
+    from scripts.qdrant_utils import QueryFilters
+
+    df = normalize_df(pd.read_parquet(args.data))
+    payloads = json.loads(df.to_json(orient="records", force_ascii=False))
+    rng = random.Random(0)
+
+    def candidates(n: int):
+        pool = [(str(pl["id"]), 1.0 - i / n, pl) for i, pl in enumerate(rng.choices(payloads, k=n))]
+        # Eksik değerli adaylar da olsun (None / 0 → 0 / inf kuralları)
+        for i in range(3, n, 17):
+            pid, score, pl = pool[i]
+            pool[i] = (pid, score, {**pl, "fiyat": None, "kilometre": 0})
+        return pool
+
+    scenarios = [
+        ("filtresiz (top 5)", candidates(main.RESULT_LIMIT), QueryFilters()),
+        ("sort_by fiyat_asc (100)", candidates(main.WIDE_TOP_K), QueryFilters(sort_by="fiyat_asc")),
+        ("sort_by yil_desc (100)", candidates(main.WIDE_TOP_K), QueryFilters(sort_by="yil_desc")),
+        ("fiyat_max (100)", candidates(main.WIDE_TOP_K), QueryFilters(fiyat_max=900_000)),
+        ("fiyat aralık + km_max (100)", candidates(main.WIDE_TOP_K),
+         QueryFilters(fiyat_min=600_000, fiyat_max=1_200_000, km_max=100_000)),
+    ]
+
+    print(f"\n🧮 Retrieval sonrası CPU süresi (istek başına, {args.iters} tekrar)\n")
+    print(f"{'senaryo':<30} {'eski µs':>9} {'yeni µs':>9} {'hızlanma':>9}")
+    ok = True
+    for name, results, f in scenarios:
+        same = json.loads(legacy_path(main, results, f)) == json.loads(lean_path(main, results, f))
+        ok &= same
+        old = cpu_us(lambda: legacy_path(main, results, f), args.iters)
+        new = cpu_us(lambda: lean_path(main, results, f), args.iters)
+        print(f"{name:<30} {old:9.1f} {new:9.1f} {old / new:8.1f}x {'' if same else '❌ sonuç farklı'}")
+
+    print(f"\n{'✅ Yanıtlar eski yolla birebir aynı.' if ok else '❌ Yanıt farkı var!'}")
+    sys.exit(0 if ok else 1)
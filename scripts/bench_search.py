@@ -0,0 +1,187 @@
+# scripts/bench_search.py
+"""
+Uçtan Uca Arama Benchmark'ı + Relevans Regresyon Testi (offline)
+- OpenAI ve canlı Qdrant gerektirmez:
+    LLM      → bench/queries.json içindeki kayıtlı QueryFilters fixture'ları
+    Qdrant   → bench/sample_listings.parquet'ten yüklenen in-memory Qdrant
+    Embedder → HashingEmbedder (veya --st ile gerçek SentenceTransformer)
+- Türkçe sorgu korpusunu /search'e (FastAPI TestClient) tekrar tekrar gönderir
+- Raporlar: p50/p95/p99 gecikme, farklı eşzamanlılıklarda QPS, recall@5 ve nDCG@5
+- bench/baseline.json ile kıyaslar; kalite düşerse veya gecikme tolerans dışına çıkarsa exit 1
+
+Kullanım:
+    python -m scripts.bench_search                     # baseline ile kıyasla
+    python -m scripts.bench_search --save-baseline     # mevcut sonuçları baseline yap
+    python -m scripts.bench_search --concurrency 1 4 8 --rounds 5
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BENCH_DIR = os.path.join(PROJECT_ROOT, "bench")
+TOP_N = 5
+
+
+# ============================
+# Offline ortam
+# ============================
+def load_fixtures(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def install_stubs(main, fixtures: List[dict], data_path: str, use_st: bool):
+    """api.main'in client/embedder/LLM kurucularını offline karşılıklarıyla değiştirir."""
+    import pandas as pd
+    from qdrant_client import QdrantClient
+
+    from scripts.embedder import HashingEmbedder, ST_Embedder
+    from scripts.normalize import normalize_df
+    from scripts.qdrant_utils import QueryFilters, df_to_points
+
+    embedder = ST_Embedder() if use_st else HashingEmbedder()
+    df = normalize_df(pd.read_parquet(data_path))
+
+    def build_client():
+        client = QdrantClient(":memory:")
+        df_to_points(df, embedder, client, main.COLLECTION, batch_size=256)
+        return client
+
+    recorded = {fx["query"]: QueryFilters(**fx["filters"]) for fx in fixtures}
+
+    def stub_llm_to_filters(query: str, model: str = "gpt-4o-mini") -> QueryFilters:
+        # history yolunda LLM'e "Kullanıcı geçmişi: [...]. Yeni mesaj: <sorgu>" gider
+        key = query.split("Yeni mesaj: ", 1)[-1]
+        return recorded.get(key, QueryFilters())
+
+    main.build_client = build_client
+    main.build_embedder = lambda: embedder
+    main.llm_to_filters = stub_llm_to_filters
+    return {str(u): str(i) for u, i in zip(df["url"], df["id"])}
+
+
+# ============================
+# Kalite metrikleri
+# ============================
+def recall_at(ids: List[str], relevant: Dict[str, int], k: int = TOP_N) -> float:
+    if not relevant:
+        return 1.0
+    hit = sum(1 for i in ids[:k] if i in relevant)
+    return hit / min(len(relevant), k)
+
+
+def ndcg_at(ids: List[str], relevant: Dict[str, int], k: int = TOP_N) -> float:
+    if not relevant:
+        return 1.0
+    dcg = sum((2 ** relevant.get(i, 0) - 1) / math.log2(r + 2) for r, i in enumerate(ids[:k]))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** g - 1) / math.log2(r + 2) for r, g in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+
+# ============================
+# Yük
+# ============================
+def replay(tc, fixtures: List[dict], concurrency: int, rounds: int):
+    """Korpusu rounds kez gönderir; (gecikmeler_ms, qps) döndürür."""
+    jobs = [fx["query"] for _ in range(rounds) for fx in fixtures]
+
+    def one(q: str) -> float:
+        t0 = time.perf_counter()
+        r = tc.post("/search", json={"query": q, "history": []})
+        r.raise_for_status()
+        return (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as ex:
+        lat = list(ex.map(one, jobs))
+    return lat, len(jobs) / (time.perf_counter() - t0)
+
+
+def pct(values: List[float], p: float) -> float:
+    return float(np.percentile(values, p))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", default=os.path.join(BENCH_DIR, "queries.json"))
+    ap.add_argument("--data", default=os.path.join(BENCH_DIR, "sample_listings.parquet"))
+    ap.add_argument("--baseline", default=os.path.join(BENCH_DIR, "baseline.json"))
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--st", action="store_true", help="HashingEmbedder yerine gerçek SentenceTransformer")
+    ap.add_argument("--quality-tol", type=float, default=0.02, help="recall/nDCG için izin verilen mutlak düşüş")
+    ap.add_argument("--latency-tol", type=float, default=0.5, help="p95 için izin verilen göreli artış")
+    ap.add_argument("--save-baseline", action="store_true")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, PROJECT_ROOT)
+    from fastapi.testclient import TestClient
+
+    import api.main as main
+
+    fixtures = load_fixtures(args.queries)
+    url_to_id = install_stubs(main, fixtures, args.data, args.st)
+
+    with TestClient(main.app) as tc:
+        # 1) Kalite
+        recalls, ndcgs = [], []
+        print(f"\n🎯 Relevans (top {TOP_N})\n")
+        for fx in fixtures:
+            cars = tc.post("/search", json={"query": fx["query"], "history": []}).json()
+            ids = [url_to_id.get(c.get("url"), "") for c in cars]
+            r, n = recall_at(ids, fx["relevant"]), ndcg_at(ids, fx["relevant"])
+            recalls.append(r)
+            ndcgs.append(n)
+            print(f"  recall={r:.2f} ndcg={n:.2f}  {fx['query']}")
+
+        # 2) Gecikme / QPS
+        print(f"\n⏱️ Gecikme ve QPS ({args.rounds} tur × {len(fixtures)} sorgu)\n")
+        perf = {}
+        for c in args.concurrency:
+            lat, qps = replay(tc, fixtures, c, args.rounds)
+            perf[str(c)] = {"p50": pct(lat, 50), "p95": pct(lat, 95), "p99": pct(lat, 99), "qps": qps}
+            print(f"  eşzamanlılık={c:<3} p50={perf[str(c)]['p50']:7.1f} ms  p95={perf[str(c)]['p95']:7.1f} ms  "
+                  f"p99={perf[str(c)]['p99']:7.1f} ms  qps={qps:7.1f}")
+
+    result = {"recall@5": statistics.mean(recalls), "ndcg@5": statistics.mean(ndcgs), "latency": perf}
+    print(f"\n📊 recall@5={result['recall@5']:.3f}  ndcg@5={result['ndcg@5']:.3f}")
+
+    # 3) Baseline
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Baseline kaydedildi: {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ Baseline yok; --save-baseline ile oluştur.")
+        sys.exit(0)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+
+    failures = []
+    for key in ("recall@5", "ndcg@5"):
+        if result[key] < base[key] - args.quality_tol:
+            failures.append(f"{key}: {base[key]:.3f} → {result[key]:.3f}")
+    for c, p in perf.items():
+        b = base.get("latency", {}).get(c)
+        if b and p["p95"] > b["p95"] * (1 + args.latency_tol):
+            failures.append(f"p95@{c}: {b['p95']:.1f} ms → {p['p95']:.1f} ms")
+
+    if failures:
+        print("❌ Regresyon:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("✅ Baseline'a göre regresyon yok.")
@@ -0,0 +1,107 @@
+# scripts/bench_startup.py
+"""
+Startup Benchmark
+- `python -X importtime -c "import api.main"` çıktısından toplam import süresini
+  ve en pahalı 10 modülü raporlar
+- uvicorn worker'ı başlatır; /ready 200 dönene kadar geçen süreyi ve
+  ilk /search yanıt süresini ölçer
+
+Kullanım:
+    python -m scripts.bench_startup
+    python -m scripts.bench_startup --query "2018 sonrası otomatik Astra" --port 8765
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+# ============================
+# Import süresi
+# ============================
+def import_times(module: str = "api.main"):
+    """(toplam_us, [(cumulative_us, modül), ...]) döndürür."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+
+    # En dış seviyedeki importlar (girinti yok) toplam süreyi verir
+    total = sum(us for us, name in rows if not name.startswith("  "))
+    top = sorted(((us, name.strip()) for us, name in rows), reverse=True)[:10]
+    return total, top
+
+
+# ============================
+# Worker başlangıç süresi
+# ============================
+def wait_ready(base: str, timeout: float) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        try:
+            with urllib.request.urlopen(f"{base}/ready", timeout=2) as r:
+                if r.status == 200:
+                    return time.perf_counter() - t0
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{timeout}s içinde /ready 200 dönmedi")
+
+
+def first_search(base: str, query: str) -> float:
+    body = json.dumps({"query": query, "history": []}).encode()
+    req = urllib.request.Request(f"{base}/search", data=body, headers={"Content-Type": "application/json"})
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=60) as r:
+        r.read()
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--query", default="İstanbul’da 1.3 milyon TL’ye kadar 2018 sonrası otomatik benzinli Astra")
+    ap.add_argument("--timeout", type=float, default=180)
+    args = ap.parse_args()
+
+    # 1) Import süresi
+    total, top = import_times()
+    print(f"\n📦 import api.main: {total / 1000:.1f} ms\n")
+    for us, name in top:
+        print(f"  {us / 1000:9.1f} ms  {name}")
+
+    # 2) Worker → /ready → ilk /search
+    base = f"http://127.0.0.1:{args.port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+    )
+    try:
+        ready_s = wait_ready(base, args.timeout)
+        print(f"\n🚀 Process başlangıcından /ready'e: {ready_s * 1000:.0f} ms")
+        try:
+            search_s = first_search(base, args.query)
+            print(f"🔎 İlk /search yanıtı: {search_s * 1000:.0f} ms")
+            print(f"⏱️ Process başlangıcından ilk yanıta: {(time.perf_counter() - t0) * 1000:.0f} ms")
+        except urllib.error.HTTPError as e:
+            print(f"⚠️ /search hata döndü ({e.code}); OPENAI_API_KEY ve Qdrant verisini kontrol et.")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
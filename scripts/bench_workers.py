@@ -0,0 +1,147 @@
+# scripts/bench_workers.py
+"""
+Worker Ölçeklenme Benchmark'ı (Linux)
+- uvicorn'u artan worker sayılarıyla iki modda başlatır:
+    local  → her worker kendi SentenceTransformer kopyasını yükler
+    shared → model tek bir embed_server process'inde, worker'lar Unix socket ile bağlanır
+- Her koşu için worker başına RSS ve toplam RSS (embed_server dahil) raporlanır
+- Sabit eşzamanlılıkta istek atarak throughput (istek/sn) ölçülür
+
+Kullanım:
+    python -m scripts.bench_workers --workers 1 2 4 --duration 20
+    python -m scripts.bench_workers --modes shared --path /ready --method GET
+"""
+
+import argparse
+import json
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from scripts.bench_startup import PROJECT_ROOT, wait_ready
+
+SOCKET = os.path.join(tempfile.mkdtemp(prefix="car_embedder_bench-"), "embedder.sock")  # mkdtemp: 0700
+
+
+# ============================
+# /proc yardımcıları
+# ============================
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def children(pid: int) -> List[int]:
+    kids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            kids.append(int(entry))
+    return kids
+
+
+# ============================
+# Yük üretici
+# ============================
+def throughput(url: str, method: str, body: bytes, concurrency: int, duration: float) -> float:
+    deadline = time.perf_counter() + duration
+
+    def worker() -> int:
+        n = 0
+        while time.perf_counter() < deadline:
+            req = urllib.request.Request(url, data=body if method == "POST" else None, method=method,
+                                         headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(req, timeout=60) as r:
+                    r.read()
+                n += 1
+            except urllib.error.URLError:
+                pass
+        return n
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as ex:
+        done = sum(ex.map(lambda _: worker(), range(concurrency)))
+    return done / (time.perf_counter() - t0)
+
+
+def run(mode: str, workers: int, args) -> dict:
+    env = dict(os.environ)
+    server = None
+    if mode == "shared":
+        env["EMBEDDER_SOCKET"] = SOCKET
+        env.setdefault("EMBEDDER_AUTHKEY", secrets.token_hex(32))
+        server = subprocess.Popen([sys.executable, "-m", "scripts.embed_server", "--socket", SOCKET],
+                                  cwd=PROJECT_ROOT, env=env)
+        t0 = time.perf_counter()
+        while not os.path.exists(SOCKET) and time.perf_counter() - t0 < args.timeout:
+            time.sleep(0.1)
+    else:
+        env.pop("EMBEDDER_SOCKET", None)
+
+    base = f"http://127.0.0.1:{args.port}"
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(args.port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env,
+    )
+    try:
+        wait_ready(base, args.timeout)
+        time.sleep(args.settle)  # tüm worker'ların lifespan'ı bitsin
+        body = json.dumps({"query": args.query, "history": []}).encode()
+        qps = throughput(base + args.path, args.method, body, args.concurrency, args.duration)
+
+        worker_rss = [rss_mb(p) for p in children(api.pid)]
+        server_rss = rss_mb(server.pid) if server else 0.0
+        return {
+            "mode": mode,
+            "workers": workers,
+            "rss_per_worker": sum(worker_rss) / max(len(worker_rss), 1),
+            "rss_total": sum(worker_rss) + rss_mb(api.pid) + server_rss,
+            "server_rss": server_rss,
+            "qps": qps,
+        }
+    finally:
+        api.terminate()
+        api.wait(timeout=30)
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--modes", nargs="+", default=["local", "shared"], choices=["local", "shared"])
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--path", default="/search")
+    ap.add_argument("--method", default="POST", choices=["GET", "POST"])
+    ap.add_argument("--query", default="2018 sonrası otomatik benzinli Astra")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=15)
+    ap.add_argument("--settle", type=float, default=5)
+    ap.add_argument("--timeout", type=float, default=300)
+    args = ap.parse_args()
+
+    rows = [run(mode, n, args) for mode in args.modes for n in args.workers]
+
+    print(f"\n{'mod':<8} {'worker':>6} {'RSS/worker MB':>14} {'embed_server MB':>16} {'toplam MB':>10} {'istek/sn':>9}")
+    for r in rows:
+        print(f"{r['mode']:<8} {r['workers']:>6} {r['rss_per_worker']:>14.0f} {r['server_rss']:>16.0f} "
+              f"{r['rss_total']:>10.0f} {r['qps']:>9.1f}")
@@ -0,0 +1,68 @@
+# scripts/build_neighbors.py
+"""
+Komşu Grafiği Oluşturma (offline job)
+- Qdrant koleksiyonundaki tüm ilanları vektörleriyle okur (scroll)
+- Her ilan için top-K benzer ilanı hesaplar (vektör + fiyat/yıl/km yakınlığı)
+- Sonucu .npz olarak (atomik) kaydeder; API /similar/{id} bu dosyayı belleğe yükler,
+  çalışan worker'lar değişikliği NEIGHBORS_CHECK_INTERVAL içinde yeniden başlatılmadan görür
+
+Kullanım:
+    python -m scripts.build_neighbors --out data/neighbors.npz --k 20
+    python -m scripts.build_neighbors --out data/neighbors.npz --ids 123 456   # artımlı güncelleme
+"""
+
+import argparse
+import os
+import time
+
+from qdrant_client import QdrantClient
+
+from scripts.neighbors import DEFAULT_K, NeighborGraph
+
+
+def scroll_points(client: QdrantClient, collection: str, batch: int = 1024):
+    """Koleksiyondaki tüm noktaları (id, vektör, payload) olarak döndürür."""
+    ids, vecs, pls = [], [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=batch, offset=offset, with_vectors=True, with_payload=True
+        )
+        for p in points:
+            ids.append(str(p.id))
+            vecs.append(p.vector)
+            pls.append(p.payload or {})
+        if offset is None:
+            return ids, vecs, pls
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--qdrant-url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    ap.add_argument("--collection", default=os.getenv("QDRANT_COLLECTION", "car_listings_st"))
+    ap.add_argument("--out", default=os.getenv("NEIGHBORS_PATH", "data/neighbors.npz"))
+    ap.add_argument("--k", type=int, default=DEFAULT_K)
+    ap.add_argument("--ids", nargs="*", help="Sadece bu ilanları güncelle (Qdrant'ta yoksa grafikten silinir)")
+    args = ap.parse_args()
+
+    client = QdrantClient(url=args.qdrant_url, prefer_grpc=False)
+    t0 = time.perf_counter()
+
+    if args.ids:
+        # 1) Artımlı: mevcut grafiği yükle, değişen ilanları çek
+        graph = NeighborGraph.load(args.out)
+        points = client.retrieve(args.collection, ids=[int(i) if i.isdigit() else i for i in args.ids],
+                                 with_vectors=True, with_payload=True)
+        found = {str(p.id) for p in points}
+        graph.upsert([str(p.id) for p in points], [p.vector for p in points], [p.payload or {} for p in points])
+        graph.remove([i for i in args.ids if i not in found])
+        print(f"🔁 {len(found)} ilan güncellendi, {len(args.ids) - len(found)} ilan silindi")
+    else:
+        # 2) Tam oluşturma
+        ids, vecs, pls = scroll_points(client, args.collection)
+        print(f"📥 {len(ids)} ilan okundu")
+        graph = NeighborGraph.build(ids, vecs, pls, k=args.k)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    graph.save(args.out)
+    print(f"✅ {len(graph)} ilan × {graph.k} komşu → {args.out} ({time.perf_counter() - t0:.1f} sn)")
@@ -0,0 +1,69 @@
+# scripts/check_rule_filters.py
+"""
+Degrade Mod Filtre Kontrolü (offline)
+- rule_based_filters çıktısını bench/queries.json'daki kayıtlı LLM filtreleriyle kıyaslar
+  (fiyat / yıl / km sınırları ve sort_by; marka/seri/model kural tabanlı çıkarılmaz)
+- Ek fiyat ifadeleri: ondalıklı birimler ("1.5 milyon"), ekler ("TL'ye", "bin'e", "'den fazla"),
+  bileşik tutarlar ("1 milyon 200 bin"), önde karşılaştırma ("en fazla 1 milyon TL"),
+  "km'si / kilometresi" önekli km'ler; karşılaştırma kelimesi olmayan yıl filtreye girmez
+- Sayılar %15 tolerans içinde olmalı ("450 bin civarı" → LLM 400–500 bin, kural 405–495 bin)
+- Herhangi bir durum tutmazsa exit 1
+
+Kullanım:
+    python -m scripts.check_rule_filters
+"""
+
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BENCH_DIR = os.path.join(PROJECT_ROOT, "bench")
+
+FIELDS = ("fiyat_min", "fiyat_max", "yil_min", "yil_max", "km_min", "km_max", "sort_by")
+NUM_TOL = 0.15
+
+EXTRA_CASES = [
+    ("1,5 milyon altı dizel", {"fiyat_max": 1_500_000}),
+    ("1.250.000 TL altı", {"fiyat_max": 1_250_000}),
+    ("750.000 TL'den fazla 2015 öncesi", {"fiyat_min": 750_000, "yil_max": 2015}),
+    ("500 bin'e kadar 150 bin km'ye kadar", {"fiyat_max": 500_000, "km_max": 150_000}),
+    ("Kullanıcı geçmişi: ['2 milyon altı']. Yeni mesaj: 1.2 milyon TL'ya kadar olsun", {"fiyat_max": 1_200_000}),
+    ("1 milyon 200 bin altı", {"fiyat_max": 1_200_000}),
+    ("1 milyon 200 bin'in altında dizel", {"fiyat_max": 1_200_000}),
+    ("km si 100.000 altı", {"km_max": 100_000}),
+    ("kilometresi 80 binden az otomatik", {"km_max": 80_000}),
+    ("km'si en fazla 120 bin, 900 bin TL altı", {"km_max": 120_000, "fiyat_max": 900_000}),
+    ("2020 model 1.000.000 tl altı", {"fiyat_max": 1_000_000}),
+    ("en fazla 1 milyon TL", {"fiyat_max": 1_000_000}),
+    ("en az 500 bin en fazla 800 bin", {"fiyat_min": 500_000, "fiyat_max": 800_000}),
+    ("maksimum 150 bin km 2018'den sonra", {"km_max": 150_000, "yil_min": 2018}),
+    ("2015 model ve öncesi en fazla 600 bin", {"yil_max": 2015, "fiyat_max": 600_000}),
+]
+
+
+def close(a, b) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) <= NUM_TOL * max(abs(a), abs(b))
+    return a == b
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, PROJECT_ROOT)
+    from scripts.filters import rule_based_filters
+
+    with open(os.path.join(BENCH_DIR, "queries.json"), encoding="utf-8") as f:
+        cases = [(fx["query"], fx["filters"]) for fx in json.load(f)] + EXTRA_CASES
+
+    failures = 0
+    print("\n📐 Kural tabanlı filtreler\n")
+    for query, expected in cases:
+        got = rule_based_filters(query).model_dump()
+        diff = {k: (expected.get(k), got.get(k)) for k in FIELDS if not close(expected.get(k), got.get(k))}
+        failures += bool(diff)
+        print(f"  {'✅' if not diff else '❌'} {query}" + (f"  (beklenen, bulunan): {diff}" if diff else ""))
+
+    if failures:
+        print(f"\n❌ {failures} durum hatalı")
+        sys.exit(1)
+    print("\n✅ Tüm durumlar doğru.")
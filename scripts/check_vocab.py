@@ -0,0 +1,78 @@
+# scripts/check_vocab.py
+"""
+VocabIndex Çözümleme Kontrolü (offline)
+- bench/sample_listings.parquet + ek kanonik key'lerden sözlük kurar
+- Türkçe karakter / ayraç / yazım hatası varyantlarının doğru key'e çözüldüğünü,
+  farklı sayılı modellerin (5 serisi / 3 serisi, 2008 / 3008, 208 / 308) birbirine
+  EŞLENMEDİĞİNİ kontrol eder
+- Herhangi bir durum tutmazsa exit 1
+
+Kullanım:
+    python -m scripts.check_vocab
+"""
+
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BENCH_DIR = os.path.join(PROJECT_ROOT, "bench")
+
+EXTRA_ROWS = [
+    ("toyota", "c-hr", "1.8 hybrid flame"),
+    ("fiat", "sahin", "1.6"),
+    ("bmw", "3 serisi", "320i"),
+    ("peugeot", "3008", "1.5 bluehdi"),
+    ("peugeot", "308", "1.2 puretech"),
+]
+
+# (marka, seri, model) → beklenen (marka_key, seri_key, model_key)
+CASES = [
+    # Türkçe karakter / ayraç / yazım hatası
+    (("Fiat", "Şahin", None), ("fiat", "sahin", None)),
+    (("Toyota", "CHR", None), ("toyota", "c-hr", None)),
+    (("Toyta", "C-HR", None), ("toyota", "c-hr", None)),
+    (("Renault", "Megan", None), ("renault", "megane", None)),
+    (("Folksvagen", "Pasat", None), ("volkswagen", "passat", None)),
+    (("Ford", "Fokus", None), ("ford", "focus", None)),
+    (("Opel", "astr", None), ("opel", "astra", None)),
+    (("BMW", "3 Serisi", "320i"), ("bmw", "3 serisi", "320i")),
+    # Farklı sayı = farklı model → eşleşme yok
+    (("BMW", "5 Serisi", None), ("bmw", None, None)),
+    (("Peugeot", "2008", None), ("peugeot", None, None)),
+    (("Peugeot", "208", None), ("peugeot", None, None)),
+    (("BMW", "3 Serisi", "520i"), ("bmw", "3 serisi", None)),
+    # Sözlükte olmayan marka
+    (("Tesla", None, None), (None, None, None)),
+]
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, PROJECT_ROOT)
+    import pandas as pd
+
+    from scripts.normalize import ascii_lower
+    from scripts.vocab import VocabIndex
+
+    df = pd.read_parquet(os.path.join(BENCH_DIR, "sample_listings.parquet"))
+    rows = {(ascii_lower(a), ascii_lower(b), ascii_lower(c)) for a, b, c in zip(df["marka"], df["seri"], df["model"])}
+    vocab = VocabIndex(rows | set(EXTRA_ROWS))
+
+    failures = 0
+    print(f"\n🔤 VocabIndex ({len(vocab)} key)\n")
+    for query, expected in CASES:
+        got = vocab.resolve(*query)
+        ok = got == expected
+        failures += not ok
+        print(f"  {'✅' if ok else '❌'} {query} → {got}" + ("" if ok else f"  (beklenen {expected})"))
+
+    n = 10_000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        vocab.resolve("Renault", "Megan", "1.5 dci")
+    print(f"\n⏱️ {(time.perf_counter() - t0) / n * 1e6:.1f} µs/çözümleme")
+
+    if failures:
+        print(f"❌ {failures} durum hatalı")
+        sys.exit(1)
+    print("✅ Tüm durumlar doğru.")
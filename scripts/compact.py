@@ -0,0 +1,189 @@
+"""
+compact.py
+LLM'e giden aday araç listesini sıkıştırma
+- Neredeyse aynı ilanları tekilleştirme
+- Alan etiketlerini tek başlık satırına indirme (tablo formatı)
+- URL'leri kısa referans kodlarıyla (L1, L2, ...) değiştirme
+- Üretilen metinde referansları tekrar URL'ye açma (stream dahil)
+- Tokenizer ile ölçülen token bütçesi uygulama
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from scripts.normalize import ascii_lower, extract_city
+
+
+DEFAULT_TOKEN_BUDGET = 800
+DEDUPE_TOL = 0.01
+
+# Referans kodu LLM çıktısında markdown link hedefi olarak kalır: [İlana Git](L3)
+REF_PATTERN = re.compile(r"\((L\d+)\)")
+
+# (kolon başlığı, araç sözlüğündeki alan(lar))
+COLUMNS = [
+    ("yil", ("yil",)),
+    ("arac", ("marka", "seri", "model")),
+    ("fiyat_tl", ("fiyat",)),
+    ("km", ("kilometre", "km")),
+    ("yakit", ("yakit_tipi",)),
+    ("vites", ("vites_tipi",)),
+    ("sehir", ("konum",)),
+]
+
+
+# ============================
+# Token sayacı
+# ============================
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Metnin token sayısını döndürür.
+    tiktoken yoksa (veya encoding indirilemezse) ~4 karakter/token yaklaşımı kullanılır.
+    """
+    enc = _encoding(model)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text))
+
+
+# ============================
+# Tekilleştirme
+# ============================
+def _num(x) -> Optional[float]:
+    try:
+        return float(x) if x is not None and x != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _close(a: Optional[float], b: Optional[float], tol: float) -> bool:
+    if a is None or b is None:
+        return a is b
+    return abs(a - b) <= tol * max(abs(a), abs(b), 1.0)
+
+
+def dedupe_candidates(cars: List[Dict], tol: float = DEDUPE_TOL) -> List[Dict]:
+    """
+    Aynı marka/seri/model/yıl olup fiyatı ve km'si ±%tol içinde olan ilanları tekilleştirir.
+    Sıra korunur, ilk görülen ilan kalır.
+    """
+    kept: List[Dict] = []
+    groups: Dict[tuple, List[Tuple[Optional[float], Optional[float]]]] = {}
+
+    for car in cars:
+        key = (
+            ascii_lower(car.get("marka")),
+            ascii_lower(car.get("seri")),
+            ascii_lower(car.get("model")),
+            car.get("yil"),
+        )
+        fiyat = _num(car.get("fiyat"))
+        km = _num(car.get("kilometre", car.get("km")))
+
+        seen = groups.setdefault(key, [])
+        if any(_close(fiyat, f, tol) and _close(km, k, tol) for f, k in seen):
+            continue
+        seen.append((fiyat, km))
+        kept.append(car)
+
+    return kept
+
+
+# ============================
+# Sıkıştırma
+# ============================
+def _cell(car: Dict, fields: Tuple[str, ...]) -> str:
+    vals = []
+    for fld in fields:
+        v = car.get(fld)
+        if v is None or v == "":
+            continue
+        if fld == "konum":
+            v = ascii_lower(extract_city(v))
+        n = _num(v) if fld in ("fiyat", "kilometre", "km", "yil") else None
+        vals.append(str(int(n)) if n is not None else str(v).strip())
+        if fld in ("kilometre", "km"):
+            break  # kilometre / km aynı alanın iki adı
+    return " ".join(vals).replace("|", "/")
+
+
+def compact_candidates(
+    cars: List[Dict],
+    max_tokens: int = DEFAULT_TOKEN_BUDGET,
+    model: str = "gpt-4o-mini",
+) -> Tuple[str, Dict[str, str]]:
+    """
+    Aday araçları tek başlık satırlı, '|' ayraçlı kompakt tabloya çevirir.
+    - Neredeyse aynı ilanlar atılır
+    - Tüm adaylarda boş olan kolonlar atılır
+    - URL yerine kısa referans kodu (L1, L2, ...) yazılır
+    - Tablo max_tokens'ı aşmayacak kadar satır içerir (sıra = öncelik)
+
+    Returns: (tablo metni, {referans kodu: url})
+    """
+    cars = dedupe_candidates(cars)
+    cols = [(name, flds) for name, flds in COLUMNS if any(_cell(c, flds) for c in cars)]
+
+    lines = ["|".join(["ref"] + [name for name, _ in cols])]
+    used = count_tokens(lines[0], model)
+    refs: Dict[str, str] = {}
+
+    for i, car in enumerate(cars, start=1):
+        ref = f"L{i}"
+        line = "|".join([ref] + [_cell(car, flds) for _, flds in cols])
+        cost = count_tokens("\n" + line, model)
+        if used + cost > max_tokens:
+            break
+        used += cost
+        lines.append(line)
+        if car.get("url"):
+            refs[ref] = car["url"]
+
+    return "\n".join(lines), refs
+
+
+# ============================
+# Referans → URL açma
+# ============================
+def expand_refs(text: str, refs: Dict[str, str]) -> str:
+    """Metindeki (L3) gibi referansları (url) ile değiştirir; bilinmeyenlere dokunmaz."""
+    return REF_PATTERN.sub(lambda m: f"({refs[m.group(1)]})" if m.group(1) in refs else m.group(0), text)
+
+
+class RefExpander:
+    """
+    Stream edilen parçalarda referansları açar.
+    Parça sınırında bölünmüş bir '(L1' kalıbı, ')' gelene kadar bekletilir.
+    """
+
+    MAX_PENDING = 8  # "(L" + rakamlar + ")" için yeterli
+
+    def __init__(self, refs: Dict[str, str]):
+        self.refs = refs
+        self._buf = ""
+
+    def feed(self, chunk: str) -> str:
+        self._buf += chunk or ""
+        cut = self._buf.rfind("(")
+        if cut != -1 and ")" not in self._buf[cut:] and len(self._buf) - cut < self.MAX_PENDING:
+            ready, self._buf = self._buf[:cut], self._buf[cut:]
+        else:
+            ready, self._buf = self._buf, ""
+        return expand_refs(ready, self.refs)
+
+    def flush(self) -> str:
+        ready, self._buf = self._buf, ""
+        return expand_refs(ready, self.refs)
@@ -0,0 +1,223 @@
+"""
+embed_server.py
+Paylaşımlı embedding servisi (çok worker'lı dağıtım için)
+- SentenceTransformer modeli TEK bir process'te yüklenir
+- API worker'ları Unix socket üzerinden bağlanır (RemoteEmbedder)
+- Aynı anda gelen istekler tek bir encode çağrısında batch'lenir
+
+Güvenlik:
+- Bağlantılar EMBEDDER_AUTHKEY ile karşılıklı HMAC doğrulamasından geçer; anahtarı
+  bilmeyen taraf (sahte sunucu / istemci) pickle mesajı gönderemez
+- Varsayılan socket, sadece kullanıcının erişebildiği (0700) bir dizindedir:
+  $XDG_RUNTIME_DIR, yoksa <tmp>/car_embedder-<uid>
+
+Çalıştırma:
+    export EMBEDDER_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+    python -m scripts.embed_server
+    EMBEDDER_SOCKET=$XDG_RUNTIME_DIR/car_embedder.sock uvicorn api.main:app --workers 4
+"""
+
+import argparse
+import logging
+import os
+import queue
+import stat
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+SOCKET_NAME = "car_embedder.sock"
+
+
+def default_socket_path() -> str:
+    """$XDG_RUNTIME_DIR (systemd: 0700, kullanıcıya ait) yoksa <tmp>/car_embedder-<uid>/."""
+    base = os.getenv("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"car_embedder-{os.getuid()}")
+    return os.path.join(base, SOCKET_NAME)
+
+
+DEFAULT_SOCKET = default_socket_path()
+
+
+def get_authkey(authkey: Optional[bytes] = None) -> bytes:
+    """Verilen anahtar ya da EMBEDDER_AUTHKEY; ikisi de yoksa hata (doğrulamasız bağlantı açılmaz)."""
+    key = authkey or os.getenv("EMBEDDER_AUTHKEY", "").encode()
+    if not key:
+        raise RuntimeError("EMBEDDER_AUTHKEY ayarlanmadı (embed_server ve API worker'larında aynı olmalı)")
+    return key
+
+
+def ensure_private_dir(path: str):
+    """Socket dizinini 0700 oluşturur; başka kullanıcıya ait / grup-diğer erişimli dizini reddeder."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+        raise PermissionError(f"Socket dizini güvenli değil (sahip / izinler): {path}")
+
+
+# ============================
+# Sunucu
+# ============================
+class _Pending:
+    __slots__ = ("texts", "result", "done")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.result = None
+        self.done = threading.Event()
+
+
+class EmbedServer:
+    def __init__(
+        self,
+        embedder,
+        address: str = DEFAULT_SOCKET,
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        authkey: Optional[bytes] = None,
+    ):
+        """
+        - embedder: ST_Embedder benzeri model (embed_documents, dimension)
+        - authkey: bağlantı doğrulama anahtarı (verilmezse EMBEDDER_AUTHKEY)
+        - max_batch: bir encode çağrısındaki en fazla metin sayısı
+        - max_wait_ms: ilk istekten sonra batch'i doldurmak için beklenecek süre
+        """
+        self.embedder = embedder
+        self.address = address
+        self.authkey = get_authkey(authkey)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._q: "queue.Queue[_Pending]" = queue.Queue()
+        self._dim = embedder.dimension()
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._q.get()]
+            n = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while n < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n += len(item.texts)
+
+            texts = [t for item in batch for t in item.texts]
+            try:
+                vecs = self.embedder.embed_documents(texts)
+            except Exception as e:
+                for item in batch:
+                    item.result = e
+                    item.done.set()
+                continue
+
+            i = 0
+            for item in batch:
+                item.result = vecs[i : i + len(item.texts)]
+                i += len(item.texts)
+                item.done.set()
+
+    def _serve_conn(self, conn):
+        with conn:
+            while True:
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                op, payload = msg if isinstance(msg, tuple) and len(msg) == 2 else (None, None)
+                if op == "dim":
+                    conn.send(("ok", self._dim))
+                    continue
+                if op != "encode" or not isinstance(payload, list) or not all(isinstance(t, str) for t in payload):
+                    logger.warning("Geçersiz mesaj reddedildi: op=%r", op)
+                    conn.send(("err", f"geçersiz mesaj (op={op!r}); beklenen ('dim', None) veya ('encode', [str, ...])"))
+                    continue
+
+                pending = _Pending(payload)
+                self._q.put(pending)
+                pending.done.wait()
+                if isinstance(pending.result, Exception):
+                    conn.send(("err", repr(pending.result)))
+                else:
+                    conn.send(("ok", pending.result))
+
+    def serve_forever(self):
+        ensure_private_dir(os.path.dirname(os.path.abspath(self.address)))
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        with Listener(self.address, family="AF_UNIX", authkey=self.authkey) as listener:
+            os.chmod(self.address, 0o600)
+            logger.info("Embedder hazır: %s (dim=%d)", self.address, self._dim)
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:  # doğrulama başarısız (yanlış / eksik anahtar)
+                    logger.warning("Bağlantı reddedildi: %r", e)
+                    continue
+                threading.Thread(target=self._serve_conn, args=(conn,), daemon=True).start()
+
+
+# ============================
+# İstemci (API worker'ları)
+# ============================
+class RemoteEmbedder:
+    """ST_Embedder ile aynı arayüz; encode işini EmbedServer'a yollar. Thread başına bir bağlantı açar."""
+
+    def __init__(self, address: str = DEFAULT_SOCKET, authkey: Optional[bytes] = None):
+        self.address = address
+        self.authkey = get_authkey(authkey)
+        self._local = threading.local()
+        self._dim: Optional[int] = None
+
+    def _call(self, op: str, payload=None):
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            try:
+                conn.send((op, payload))
+                status, res = conn.recv()
+            except (EOFError, OSError):
+                # Sunucu yeniden başlatıldıysa bir kez yeniden bağlan
+                self._local.conn = None
+                if attempt:
+                    raise
+                continue
+            if status == "err":
+                raise RuntimeError(f"Embedder hatası: {res}")
+            return res
+
+    def embed_documents(self, texts): return self._call("encode", list(texts))
+    def embed_query(self, text): return self.embed_documents([text])[0]
+    def encode(self, texts): return self.embed_documents(texts)
+
+    def dimension(self):
+        if self._dim is None:
+            self._dim = self._call("dim")
+        return self._dim
+
+
+if __name__ == "__main__":
+    from scripts.embedder import ST_Embedder
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--socket", default=os.getenv("EMBEDDER_SOCKET", DEFAULT_SOCKET))
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = ap.parse_args()
+
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    EmbedServer(ST_Embedder(), args.socket, args.max_batch, args.max_wait_ms).serve_forever()
@@ -1,11 +1,40 @@
 # scripts/embedder.py
-from sentence_transformers import SentenceTransformer
+import hashlib
+
+import numpy as np
+
+from scripts.normalize import ascii_lower
 
 class ST_Embedder:
     def __init__(self, model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2", device="cpu"):
+        # torch + sentence-transformers ağır; sadece model gerçekten yüklenirken import et
+        from sentence_transformers import SentenceTransformer
         self.model = SentenceTransformer(model_name, device=device)
     def embed_documents(self, texts): return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).tolist()
     def embed_query(self, text): return self.embed_documents([text])[0]
     def dimension(self): return self.model.get_sentence_embedding_dimension()
     def encode(self, texts):
         return self.embed_documents(texts)
+
+
+class HashingEmbedder:
+    """
+    Model indirmeden çalışan deterministik embedder (benchmark / offline testler için).
+    Karakter 3-gram'ları + kelimeler sabit boyutlu vektöre hash'lenir, L2 normalize edilir.
+    """
+    def __init__(self, dim=256):
+        self.dim = dim
+    def _vec(self, text):
+        v = np.zeros(self.dim, dtype=np.float32)
+        s = ascii_lower(text)
+        grams = s.split() + [s[i:i + 3] for i in range(max(len(s) - 2, 0))]
+        for g in grams:
+            h = int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "little")
+            v[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        n = np.linalg.norm(v)
+        return v / n if n else v
+    def embed_documents(self, texts): return [self._vec(t).tolist() for t in texts]
+    def embed_query(self, text): return self.embed_documents([text])[0]
+    def dimension(self): return self.dim
+    def encode(self, texts):
+        return self.embed_documents(texts)
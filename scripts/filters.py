@@ -4,16 +4,22 @@ LLM tabanlı filtre çıkarıcı
 - Kullanıcının doğal dildeki sorgusunu alır
 - JSON formatında filtre çıkarır (marka, fiyat, yıl, km, yakıt, vites, vb.)
 - QueryFilters objesine dönüştürür
+- Yeni mesajın filtrelerini önceki turun filtreleriyle birleştirir
+- LLM bütçesi tükenirse (hız sınırı / 429) önbellekten veya kurallarla filtre üretir (degrade mod)
 """
 
 import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional
 from pydantic import BaseModel
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_openai import ChatOpenAI
 
 from scripts.qdrant_utils import QueryFilters
+from scripts.normalize import ascii_lower
+from scripts.metrics import LLM_EVENTS, record_llm_tokens
+from scripts.ratelimit import LLMBudgetExceeded, get_limiter
 
 
 # ============================
@@ -78,14 +84,139 @@ Sorgu: "{query}".
 Lütfen sadece JSON döndür (şema: {format_instructions}).
 """
 
-# Prompt zinciri
-prompt = ChatPromptTemplate.from_messages([
-    ("system", SYSTEM.strip()),
-    ("human", HUMAN.strip()),
-])
+# ============================
+# Zincir (prompt → LLM) + parser
+# ============================
+@lru_cache(maxsize=8)
+def _build_chain(model: str, api_key: str):
+    """
+    Zinciri ilk çağrıda kurar ve saklar.
+    langchain importları burada: API worker'ı açılırken yüklenmez.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import PydanticOutputParser
+    from langchain_openai import ChatOpenAI
 
-# Parser
-parser = PydanticOutputParser(pydantic_object=FilterSpec)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM.strip()),
+        ("human", HUMAN.strip()),
+    ])
+    parser = PydanticOutputParser(pydantic_object=FilterSpec)
+    llm = ChatOpenAI(api_key=api_key, model=model, temperature=0)
+    return prompt | llm, parser, parser.get_format_instructions()
+
+
+# ============================
+# Degrade mod: önbellek + kural tabanlı çıkarım
+# ============================
+CACHE_SIZE = 2048
+MIN_PRICE = 10_000
+
+_cache: "OrderedDict[str, QueryFilters]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_put(query: str, filters: QueryFilters):
+    with _cache_lock:
+        _cache[query] = filters
+        _cache.move_to_end(query)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _cache_get(query: str) -> Optional[QueryFilters]:
+    with _cache_lock:
+        return _cache.get(query)
+
+
+_N = r"\d+(?:[.,]\d+)*"
+# Tutar: "1.250.000", "1,5 milyon", "500 bin", "100k"; bileşik "1 milyon 200 bin" tek tutardır
+_AMOUNT = rf"({_N}\s*milyon(?:\s*{_N}\s*bin)?|{_N}\s*(?:bin|k\b)?)"
+# Sayı / birimden sonra gelen ekler: "1.3 milyon TL'ye kadar", "500 bin'e kadar", "1 milyonun altında"
+_SUFFIX = r"(?:'?(?:ye|ya|e|a|den|dan|ten|tan|un|in))?"
+# Sayıdan önce gelen karşılaştırma: "en fazla 1 milyon TL", "en az 500 bin"
+_PRE_WORDS = r"en fazla|en cok|en az|maksimum|max|minimum|min"
+_PRE = "(" + _PRE_WORDS + ")"
+_CMP = r"(alti|altinda|kadar|en fazla|en az|ustu|ustunde|uzeri|fazla|az|civari|civarinda)"
+_RANGE = re.compile(
+    r"(?:\b(km|kilometre)\s*'?\s*si\s+)?"     # "km'si 100.000 altı", "kilometresi 80 bin altı"
+    + r"(?:\b" + _PRE + r"\s+)?"
+    + r"\b" + _AMOUNT
+    + r"(?:\s*(tl|lira|km|kilometre))?" + _SUFFIX
+    # "en az 500 bin en fazla 800 bin": sayıdan önce gelen kelime sonraki sayıya aittir
+    + r"(?:\s*(?!(?:" + _PRE_WORDS + r")\s+\d)" + _CMP + r"\b)?"
+)
+_YEAR = re.compile(
+    r"(?:\b" + _PRE + r"\s+)?"
+    + r"\b((?:19|20)\d{2})\b(?:\s*model)?" + _SUFFIX
+    + r"(?:\s*(ve sonrasi|sonrasi|sonra|ustu|uzeri|ve oncesi|oncesi|once|alti)\b)?"
+)
+_MAX_WORDS = ("alti", "altinda", "kadar", "en fazla", "en cok", "maksimum", "max", "az")
+_YEAR_MAX_WORDS = ("ve oncesi", "oncesi", "once", "alti") + _MAX_WORDS
+_AROUND_WORDS = ("civari", "civarinda")
+AROUND_TOL = 0.1   # "450 bin civarı" → 405 bin – 495 bin
+
+_YAKIT = {"benzin": "benzin", "dizel": "dizel", "mazot": "dizel", "hibrit": "hibrit", "elektrik": "elektrik", "lpg": "lpg"}
+_VITES = {"otomatik": "otomatik", "manuel": "manuel", "duz vites": "manuel", "yari otomatik": "yari otomatik"}
+_SORT = [
+    ("en pahali", "fiyat_desc"), ("en yuksek fiyat", "fiyat_desc"),
+    ("en ucuz", "fiyat_asc"), ("en dusuk fiyat", "fiyat_asc"),
+    ("en yeni", "yil_desc"), ("en guncel", "yil_desc"), ("en eski", "yil_asc"),
+    ("en az km", "km_asc"), ("dusuk km", "km_asc"), ("en cok km", "km_desc"), ("yuksek km", "km_desc"),
+]
+
+
+def _amount(text: str) -> float:
+    """
+    "1.250.000" → 1250000, "750,000" → 750000, "1 milyon 200 bin" → 1200000
+    Birim varsa tek ayraç + 1-2 hane ondalıktır: "1.5 milyon" / "1,5 milyon" → 1500000
+    """
+    total = 0.0
+    for num, unit in re.findall(r"(\d+(?:[.,]\d+)*)\s*(milyon|bin|k)?", text):
+        if unit and re.fullmatch(r"\d+[.,]\d{1,2}", num):
+            n = float(num.replace(",", "."))
+        else:
+            n = float(re.sub(r"[.,]", "", num))
+        total += n * {"milyon": 1_000_000, "bin": 1_000, "k": 1_000}.get(unit, 1)
+    return total
+
+
+def _bound(f: dict, lo: str, hi: str, word: str, value: float):
+    if word in _AROUND_WORDS:
+        f[lo], f[hi] = value * (1 - AROUND_TOL), value * (1 + AROUND_TOL)
+    else:
+        f[hi if not word or word in _MAX_WORDS else lo] = value
+
+
+def rule_based_filters(query: str) -> QueryFilters:
+    """
+    LLM'siz, kural tabanlı kaba filtre çıkarımı (degrade mod):
+    fiyat / km / yıl sınırları, yakıt, vites ve sort_by. Marka/seri/model çıkarılmaz;
+    semantik arama bunları sorgu metninden zaten yakalar.
+    Sınırlar Qdrant'ta zorunlu (must) koşul olur → emin olunmayan sayı filtreye girmez:
+    - Fiyat ve yıl sadece karşılaştırma kelimesiyle ("altı", "en fazla", "sonrası" ...)
+    - km: "km" birimi veya "km'si / kilometresi" öneki; kelime yoksa üst sınır ("150 bin km")
+    """
+    q = ascii_lower(query.split("Yeni mesaj: ", 1)[-1])
+    f = {}
+
+    for km_pre, pre, amount, unit, post in _RANGE.findall(q):
+        word = pre or post
+        if km_pre or unit in ("km", "kilometre"):
+            _bound(f, "km_min", "km_max", word, _amount(amount))
+        elif word and not re.fullmatch(r"(?:19|20)\d{2}", amount):  # yıllar aşağıda
+            value = _amount(amount)
+            if value >= MIN_PRICE:
+                _bound(f, "fiyat_min", "fiyat_max", word, value)
+    for pre, year, post in _YEAR.findall(q):
+        word = pre or post
+        if word:
+            f["yil_max" if word in _YEAR_MAX_WORDS else "yil_min"] = int(year)
+
+    f["yakit"] = next((v for k, v in _YAKIT.items() if k in q), None)
+    f["vites"] = next((v for k, v in _VITES.items() if k in q), None)
+    f["sort_by"] = next((v for k, v in _SORT if k in q), None)
+    return QueryFilters(**f)
 
 
 # ============================
@@ -94,22 +225,55 @@ parser = PydanticOutputParser(pydantic_object=FilterSpec)
 def llm_to_filters(query: str, model: str = "gpt-4o-mini") -> QueryFilters:
     """
     Kullanıcı sorgusunu LLM'e gönderir, JSON filtre çıkarır ve QueryFilters döner.
+    Çağrı model başına limiter altındadır (eşzamanlılık + hız + 429 yeniden deneme);
+    bütçe tükenirse aynı sorgunun son LLM sonucu, o da yoksa rule_based_filters döner.
     """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY ortam değişkeni ayarlanmadı!")
 
-    # LLM
-    llm = ChatOpenAI(api_key=api_key, model=model, temperature=0)
-
-    # Zincir (prompt → LLM → parser)
-    chain = prompt | llm | parser
+    # Zincir (prompt → LLM); parser ayrı çalışır ki token kullanımı okunabilsin
+    chain, parser, format_instructions = _build_chain(model, api_key)
 
     # Çalıştır
-    spec: FilterSpec = chain.invoke({
-        "query": query,
-        "format_instructions": parser.get_format_instructions()
-    })
+    try:
+        msg = get_limiter(model).call(chain.invoke, {
+            "query": query,
+            "format_instructions": format_instructions
+        })
+    except LLMBudgetExceeded:
+        cached = _cache_get(query)
+        LLM_EVENTS.inc(model=model, event="degraded_cache" if cached else "degraded_rules")
+        return cached if cached is not None else rule_based_filters(query)
+
+    record_llm_tokens(model, "llm_filters", getattr(msg, "usage_metadata", None))
+    spec: FilterSpec = parser.parse(msg.content)
 
     # FilterSpec → QueryFilters dönüşümü
-    return QueryFilters(**spec.dict())
+    filters = QueryFilters(**spec.dict())
+    _cache_put(query, filters)
+    return filters
+
+
+# ============================
+# Filtre birleştirme (session)
+# ============================
+def merge_filters(base: Optional[QueryFilters], new: QueryFilters) -> QueryFilters:
+    """
+    Yeni mesajdan çıkan filtreleri önceki turun filtrelerinin üzerine yazar.
+    - Yeni mesajda boş kalan alanlar önceki değeri korur
+    - Marka değiştiyse seri/model, seri değiştiyse model sıfırlanır
+    """
+    if base is None:
+        return new
+
+    merged = base.model_dump()
+    upd = new.model_dump(exclude_none=True)
+
+    if "marka" in upd and ascii_lower(upd["marka"]) != ascii_lower(merged.get("marka")):
+        merged["seri"] = merged["model"] = None
+    if "seri" in upd and ascii_lower(upd["seri"]) != ascii_lower(merged.get("seri")):
+        merged["model"] = None
+
+    merged.update(upd)
+    return QueryFilters(**merged)
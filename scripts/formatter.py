@@ -1,7 +1,32 @@
 import os
+import time
 from typing import List, Dict
 from langchain_openai import ChatOpenAI
 
+from scripts.compact import compact_candidates, RefExpander
+from scripts.metrics import LLM_EVENTS
+from scripts.ratelimit import LLMBudgetExceeded, get_limiter, is_rate_limited
+
+FORMATTER_MODEL = "gpt-4o"
+
+
+def format_car_results_plain(cars: List[Dict]) -> str:
+    """LLM'siz liste (LLM bütçesi tükendiğinde degrade mod)."""
+    blocks = []
+    for c in cars:
+        fiyat = c.get("fiyat")
+        km = c.get("kilometre")
+        blocks.append(
+            f"### {c.get('yil') or ''} {c.get('marka') or ''} {c.get('model') or ''}\n"
+            f"- Fiyat: {f'{fiyat:,.0f}'.replace(',', '.') + ' TL' if fiyat else 'bilinmiyor'}\n"
+            f"- Kilometre: {f'{km:,.0f}'.replace(',', '.') + ' km' if km else 'bilinmiyor'}\n"
+            f"- Yakıt: {c.get('yakit_tipi') or 'bilinmiyor'}\n"
+            f"- Vites: {c.get('vites_tipi') or 'bilinmiyor'}\n"
+            f"- 👉 [İlana Git]({c.get('url')})"
+        )
+    return "\n\n".join(blocks)
+
+
 def format_car_results_stream(user_query: str, cars: List[Dict]):
     """
     Araç listesini LLM üzerinden satış danışmanı tarzında stream ederek formatlar.
@@ -12,16 +37,8 @@ def format_car_results_stream(user_query: str, cars: List[Dict]):
         yield "Sana uygun araç bulamadım. 😕 Başka bir şey sorabilirsin."
         return
 
-    # Araçları LLM’e gidecek string haline getir
-    cars_text = "\n\n".join([
-        f"- {car.get('yil', '—')} model {car.get('marka', '—')} {car.get('seri','')} {car.get('model','')} | "
-        f"Fiyat: {car.get('fiyat','bilinmiyor')} TL | "
-        f"Kilometre: {car.get('kilometre','bilinmiyor')} km | "
-        f"Yakıt: {car.get('yakit_tipi','bilinmiyor')} | "
-        f"Vites: {car.get('vites_tipi','bilinmiyor')} | "
-        f"URL: {car.get('url','')}"
-        for car in cars
-    ])
+    # Araçları LLM’e gidecek kompakt tabloya çevir (URL → L1, L2, ... referansları)
+    cars_text, refs = compact_candidates(cars, model=FORMATTER_MODEL)
 
     # --- Daha sade ve doğru sistem prompt ---
     system_prompt = """
@@ -35,7 +52,9 @@ Format:
 - Kilometre: ...
 - Yakıt: ...
 - Vites: ...
-- 👉 İlana Git
+- 👉 [İlana Git](REF)
+
+Aday tablosundaki 'ref' kolonundaki kodu (L1, L2, ...) REF yerine aynen yaz.
 
 Sonunda:
 - Araçlar arasında kısa bir kıyaslama yap (maksimum 3 cümle).
@@ -49,15 +68,48 @@ Sonunda:
     # OpenAI LLM
     llm = ChatOpenAI(
         api_key=os.getenv("OPENAI_API_KEY"),
-        model="gpt-4o",       # güçlü model
+        model=FORMATTER_MODEL,  # güçlü model
         temperature=0.3,
         streaming=True
     )
 
-    # streaming → parça parça yield et
-    for chunk in llm.stream([
+    messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": human_prompt}
-    ]):
-        if chunk.content:
-            yield chunk.content
+    ]
+
+    # streaming → parça parça yield et (referanslar URL'ye açılarak)
+    # Limiter: model başına eşzamanlılık + hız; 429 sadece ilk parça gelmeden yeniden denenir
+    limiter = get_limiter(FORMATTER_MODEL)
+    deadline = time.monotonic() + limiter.max_wait
+    attempt = 0
+    started = False
+    while True:
+        expander = RefExpander(refs)
+        try:
+            with limiter.slot(deadline):
+                for chunk in llm.stream(messages):
+                    if chunk.content:
+                        text = expander.feed(chunk.content)
+                        if text:
+                            started = True
+                            yield text
+            break
+        except LLMBudgetExceeded:
+            LLM_EVENTS.inc(model=FORMATTER_MODEL, event="degraded_plain")
+            yield format_car_results_plain(cars)
+            return
+        except Exception as e:
+            if started or not is_rate_limited(e):
+                raise
+            try:
+                limiter.backoff_sleep(attempt, e, deadline)
+            except LLMBudgetExceeded:
+                LLM_EVENTS.inc(model=FORMATTER_MODEL, event="degraded_plain")
+                yield format_car_results_plain(cars)
+                return
+            attempt += 1
+
+    tail = expander.flush()
+    if tail:
+        yield tail
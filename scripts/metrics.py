@@ -0,0 +1,224 @@
+"""
+metrics.py
+Arama hattı için hafif metrik ve tracing katmanı
+- Histogram / Counter (thread-safe, bağımlılıksız)
+- span(stage): aşama süresini ölçen context manager
+- RequestTimer: HTTP istek sürelerini ölçen saf ASGI middleware
+- Prometheus text formatında dışa aktarma (/metrics)
+- Opsiyonel OpenTelemetry span'leri (OTEL_EXPORTER_OTLP_ENDPOINT ayarlıysa)
+
+Not: Metrikler process başınadır; çok worker'lı dağıtımda her worker kendi
+değerlerini raporlar.
+"""
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _fmt_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_num(v: float) -> str:
+    return "+Inf" if v == float("inf") else repr(float(v))
+
+
+# ============================
+# Metrik tipleri
+# ============================
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelKey, List[float]] = {}  # [bucket sayaçları..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += value
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for key, s in sorted(series.items()):
+            cum = 0.0
+            for le, n in zip(self.buckets + (float("inf"),), s[:-1]):
+                cum += n
+                le_label = 'le="' + _fmt_num(le) + '"'
+                out.append(f"{self.name}_bucket{_fmt_labels(key, le_label)} {int(cum)}")
+            out.append(f"{self.name}_sum{_fmt_labels(key)} {s[-1]}")
+            out.append(f"{self.name}_count{_fmt_labels(key)} {int(cum)}")
+        return out
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._series: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for key, v in sorted(series.items()):
+            out.append(f"{self.name}{_fmt_labels(key)} {v}")
+        return out
+
+
+# ============================
+# Kayıtlı metrikler
+# ============================
+STAGE_SECONDS = Histogram("search_stage_seconds", "Arama hattı aşama süreleri (saniye)")
+REQUEST_SECONDS = Histogram("http_request_seconds", "HTTP istek süreleri (saniye)")
+LLM_TOKENS = Histogram("llm_tokens", "LLM çağrısı başına token sayısı", buckets=TOKEN_BUCKETS)
+LLM_TOKENS_TOTAL = Counter("llm_tokens_total", "Toplam LLM token sayısı")
+LLM_EVENTS = Counter("llm_events_total", "LLM limiter olayları (retry_429, rate_limited, queue_full, budget_exceeded, degraded_*)")
+COALESCED = Counter("singleflight_coalesced_total", "Devam eden özdeş isteğe eklenen (tekrar çalıştırılmayan) istekler")
+
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, LLM_TOKENS, LLM_TOKENS_TOTAL, LLM_EVENTS, COALESCED]
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for m in REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_llm_tokens(model: str, stage: str, usage: Optional[dict]):
+    """langchain usage_metadata ({'input_tokens', 'output_tokens'}) sözlüğünü kaydeder."""
+    if not usage:
+        return
+    for kind in ("input", "output"):
+        n = usage.get(f"{kind}_tokens")
+        if n is None:
+            continue
+        LLM_TOKENS.observe(n, model=model, stage=stage, kind=kind)
+        LLM_TOKENS_TOTAL.inc(n, model=model, stage=stage, kind=kind)
+
+
+# ============================
+# OpenTelemetry (opsiyonel)
+# ============================
+_tracer = None
+
+
+def setup_otel(service_name: str = "car-sales-advisor-api"):
+    """
+    OTEL_EXPORTER_OTLP_ENDPOINT ayarlıysa ve opentelemetry paketleri kuruluysa
+    her span() çağrısı bir OTel span'i de üretir. Aksi halde hiçbir şey yapmaz.
+    """
+    global _tracer
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT ayarlı ama opentelemetry paketleri kurulu değil")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("scripts.metrics")
+    logger.info("OpenTelemetry exporter aktif")
+
+
+# ============================
+# Span
+# ============================
+class span:
+    """
+    Aşama süresini STAGE_SECONDS'a yazan context manager; OTel aktifse aynı isimle span açar.
+    (@contextmanager yerine sınıf: generator oluşturma maliyeti yok)
+    """
+
+    __slots__ = ("stage", "attrs", "_t0", "_otel")
+
+    def __init__(self, stage: str, **attrs):
+        self.stage = stage
+        self.attrs = attrs
+
+    def __enter__(self):
+        self._otel = None
+        if _tracer is not None:
+            self._otel = _tracer.start_as_current_span(self.stage, attributes=self.attrs or None)
+            self._otel.__enter__()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self._t0, stage=self.stage)
+        if self._otel is not None:
+            return self._otel.__exit__(*exc)
+        return False
+
+
+# ============================
+# HTTP istek süresi (ASGI middleware)
+# ============================
+class RequestTimer:
+    """
+    Saf ASGI middleware: her HTTP isteğinin süresini REQUEST_SECONDS'a yazar.
+    (@app.middleware("http") / BaseHTTPMiddleware yerine: istek başına ek task / stream kopyası yok)
+    - Label: route şablonu (/similar/{listing_id}) → label sayısı sınırlı kalır
+    - İstisna fırlatan istekler de status=500 ile kaydedilir
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            path = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, path=path, status=str(status))
@@ -0,0 +1,322 @@
+"""
+neighbors.py
+"Bu araca benzer" için önceden hesaplanmış komşu grafiği
+- Her ilan için top-K komşu: vektör benzerliği + fiyat / yıl / km yakınlığı
+- Kompakt saklama: ids + komşu indeksleri (int32) + skorlar (float32), tek .npz dosyası
+- Artımlı güncelleme: değişen / yeni / silinen ilanlar için sadece etkilenen satırlar yeniden hesaplanır
+- Sorgu: id → satır → komşular (bellekten, LLM / Qdrant çağrısı yok)
+- API tarafı sadece ids / komşular / payload'ları yükler (vektörler sadece güncelleme için gerekir)
+  ve dosya değişince (mtime) yeniden yükler: NeighborGraphReloader
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 20
+DEFAULT_WEIGHTS = {"vec": 0.6, "fiyat": 0.2, "yil": 0.1, "km": 0.1}
+YEAR_SPAN = 10.0        # 10 yıl fark → yıl yakınlığı 0
+KM_FLOOR = 10_000.0     # çok düşük km'lerde oransal farkın patlamaması için
+BLOCK = 256             # satır bloğu (bellek: BLOCK × n float32)
+
+# Yanıt için saklanan payload alanları (CarResult)
+PAYLOAD_FIELDS = ("yil", "marka", "seri", "model", "fiyat", "kilometre", "yakit_tipi", "vites_tipi", "url")
+
+
+def _num(x) -> float:
+    try:
+        return float(x) if x is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def payload_features(pl: dict) -> Tuple[float, float, float]:
+    """Payload → (fiyat, yıl, km); normalize edilmiş *_num alanları tercih edilir."""
+    return (
+        _num(pl.get("fiyat_num", pl.get("fiyat"))),
+        _num(pl.get("yil_num", pl.get("yil"))),
+        _num(pl.get("km_num", pl.get("kilometre"))),
+    )
+
+
+def _ratio_closeness(a: np.ndarray, b: np.ndarray, floor: float = 1.0) -> np.ndarray:
+    d = np.abs(a[:, None] - b[None, :])
+    scale = np.maximum(np.maximum(np.abs(a)[:, None], np.abs(b)[None, :]), floor)
+    return np.nan_to_num(1.0 - np.minimum(d / scale, 1.0), nan=0.0)
+
+
+def _span_closeness(a: np.ndarray, b: np.ndarray, span: float) -> np.ndarray:
+    d = np.abs(a[:, None] - b[None, :])
+    return np.nan_to_num(1.0 - np.minimum(d / span, 1.0), nan=0.0)
+
+
+class NeighborGraph:
+    def __init__(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        feats: np.ndarray,
+        payloads: List[dict],
+        k: int = DEFAULT_K,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        """
+        - ids: ilan id'leri (str)
+        - vectors: (n, d) normalize embedding'ler
+        - feats: (n, 3) fiyat / yıl / km (eksikler NaN)
+        - payloads: yanıtta dönecek alanlar (PAYLOAD_FIELDS)
+        """
+        self.ids = np.asarray([str(i) for i in ids])
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.feats = np.asarray(feats, dtype=np.float32).reshape(len(self.ids), 3)
+        self.payloads = [{k_: pl.get(k_) for k_ in PAYLOAD_FIELDS} for pl in payloads]
+        self.k = k
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.nbr_idx = np.full((len(self.ids), k), -1, dtype=np.int32)
+        self.nbr_score = np.full((len(self.ids), k), -np.inf, dtype=np.float32)
+        self._path: Optional[str] = None
+        self._reindex()
+
+    def _reindex(self):
+        self._pos = {pid: i for i, pid in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _ensure_features(self):
+        """load(features=False) ile yüklendiyse vektör / özellikleri dosyadan ilk ihtiyaçta okur."""
+        if self.vectors is None:
+            with np.load(self._path, allow_pickle=False) as z:
+                self.vectors = z["vectors"]
+                self.feats = z["feats"]
+
+    # ============================
+    # Skorlama
+    # ============================
+    def _scores(self, rows: np.ndarray, cols: Optional[np.ndarray] = None) -> np.ndarray:
+        """rows × cols birleşik benzerlik matrisi (cols=None → tüm ilanlar)."""
+        w = self.weights
+        V = self.vectors if cols is None else self.vectors[cols]
+        F = self.feats if cols is None else self.feats[cols]
+        a = self.feats[rows]
+
+        s = w["vec"] * (self.vectors[rows] @ V.T)
+        s += w["fiyat"] * _ratio_closeness(a[:, 0], F[:, 0])
+        s += w["yil"] * _span_closeness(a[:, 1], F[:, 1], YEAR_SPAN)
+        s += w["km"] * _ratio_closeness(a[:, 2], F[:, 2], KM_FLOOR)
+        return s.astype(np.float32)
+
+    def _top_k(self, scores: np.ndarray, cand: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Her satır için en yüksek k skoru ve cand içindeki karşılık gelen indeksleri döndürür."""
+        r, c = scores.shape
+        k = min(self.k, c)
+        idx = np.full((r, self.k), -1, dtype=np.int32)
+        val = np.full((r, self.k), -np.inf, dtype=np.float32)
+        if k == 0:
+            return idx, val
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        part_s = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_s, axis=1)
+        top = np.take_along_axis(part, order, axis=1)
+        top_s = np.take_along_axis(part_s, order, axis=1)
+        idx[:, :k] = cand[top]
+        val[:, :k] = top_s
+        idx[~np.isfinite(val)] = -1  # kendisi / geçersiz adaylar
+        return idx, val
+
+    def _recompute(self, rows: np.ndarray):
+        """Verilen satırların komşularını tüm ilanlara karşı baştan hesaplar."""
+        all_idx = np.arange(len(self.ids), dtype=np.int32)
+        for s in range(0, len(rows), BLOCK):
+            blk = rows[s : s + BLOCK]
+            sc = self._scores(blk)
+            sc[np.arange(len(blk)), blk] = -np.inf  # kendisi hariç
+            self.nbr_idx[blk], self.nbr_score[blk] = self._top_k(sc, all_idx)
+
+    # ============================
+    # Oluşturma / artımlı güncelleme
+    # ============================
+    @classmethod
+    def build(cls, ids, vectors, payloads: List[dict], k: int = DEFAULT_K, weights=None) -> "NeighborGraph":
+        feats = np.array([payload_features(pl) for pl in payloads], dtype=np.float32).reshape(-1, 3)
+        g = cls(ids, vectors, feats, payloads, k=k, weights=weights)
+        g._recompute(np.arange(len(g.ids), dtype=np.int32))
+        return g
+
+    def upsert(self, ids, vectors, payloads: List[dict]):
+        """
+        Yeni / değişen ilanları ekler:
+        - Değişen ilanların ve onları komşu olarak tutan satırların komşuları baştan hesaplanır
+        - Diğer satırlarda sadece yeni adaylar mevcut top-K ile birleştirilir
+        """
+        self._ensure_features()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        changed: List[int] = []
+        for pid, vec, pl in zip(ids, vectors, payloads):
+            pid = str(pid)
+            row = self._pos.get(pid)
+            if row is None:
+                row = len(self.ids)
+                self.ids = np.append(self.ids, pid)
+                self.vectors = np.vstack([self.vectors, vec[None, :]])
+                self.feats = np.vstack([self.feats, np.zeros((1, 3), dtype=np.float32)])
+                self.nbr_idx = np.vstack([self.nbr_idx, np.full((1, self.k), -1, dtype=np.int32)])
+                self.nbr_score = np.vstack([self.nbr_score, np.full((1, self.k), -np.inf, dtype=np.float32)])
+                self.payloads.append({})
+                self._pos[pid] = row
+            self.vectors[row] = vec
+            self.feats[row] = payload_features(pl)
+            self.payloads[row] = {k_: pl.get(k_) for k_ in PAYLOAD_FIELDS}
+            changed.append(row)
+
+        if not changed:
+            return
+        changed_arr = np.asarray(sorted(set(changed)), dtype=np.int32)
+
+        affected = np.isin(self.nbr_idx, changed_arr).any(axis=1)
+        affected[changed_arr] = True
+        self._recompute(np.flatnonzero(affected).astype(np.int32))
+
+        rest = np.flatnonzero(~affected).astype(np.int32)
+        for s in range(0, len(rest), BLOCK):
+            blk = rest[s : s + BLOCK]
+            sc = np.concatenate([self.nbr_score[blk], self._scores(blk, changed_arr)], axis=1)
+            cand = np.concatenate([self.nbr_idx[blk], np.broadcast_to(changed_arr, (len(blk), len(changed_arr)))], axis=1)
+            sc[cand < 0] = -np.inf
+            idx, val = self._top_k(sc, np.arange(sc.shape[1], dtype=np.int32))
+            valid = idx >= 0
+            self.nbr_idx[blk] = np.where(valid, np.take_along_axis(cand, np.maximum(idx, 0), axis=1), -1)
+            self.nbr_score[blk] = val
+
+    def remove(self, ids):
+        """Silinen ilanları çıkarır; onları komşu olarak tutan satırlar yeniden hesaplanır."""
+        rows = np.asarray([self._pos[str(i)] for i in ids if str(i) in self._pos], dtype=np.int32)
+        if rows.size == 0:
+            return
+        self._ensure_features()
+        n = len(self.ids)
+        keep = np.ones(n, dtype=bool)
+        keep[rows] = False
+        affected = np.isin(self.nbr_idx, rows).any(axis=1)[keep]
+
+        remap = np.full(n + 1, -1, dtype=np.int32)  # son eleman: -1 → -1
+        remap[:n][keep] = np.arange(keep.sum(), dtype=np.int32)
+
+        self.ids = self.ids[keep]
+        self.vectors = self.vectors[keep]
+        self.feats = self.feats[keep]
+        self.payloads = [pl for pl, k_ in zip(self.payloads, keep) if k_]
+        self.nbr_idx = remap[self.nbr_idx[keep]]
+        self.nbr_score = self.nbr_score[keep]
+        self._reindex()
+        self._recompute(np.flatnonzero(affected).astype(np.int32))
+
+    # ============================
+    # Sorgu
+    # ============================
+    def neighbors(self, listing_id, limit: int = 5) -> Optional[List[Tuple[str, float, dict]]]:
+        """id'nin komşularını (id, skor, payload) listesi olarak döndürür; id bilinmiyorsa None."""
+        row = self._pos.get(str(listing_id))
+        if row is None:
+            return None
+        out = []
+        for j, s in zip(self.nbr_idx[row, :limit].tolist(), self.nbr_score[row, :limit].tolist()):
+            if j < 0:
+                break
+            out.append((str(self.ids[j]), s, self.payloads[j]))
+        return out
+
+    # ============================
+    # Kaydet / yükle
+    # ============================
+    def save(self, path: str):
+        """Geçici dosyaya yazıp os.replace ile değiştirir: okuyan worker yarım dosya görmez."""
+        self._ensure_features()
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                ids=self.ids,
+                vectors=self.vectors,
+                feats=self.feats,
+                nbr_idx=self.nbr_idx,
+                nbr_score=self.nbr_score,
+                payloads=np.array(json.dumps(self.payloads, ensure_ascii=False)),
+                meta=np.array(json.dumps({"k": self.k, "weights": self.weights})),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, features: bool = True) -> "NeighborGraph":
+        """
+        features=False: vektör / fiyat-yıl-km matrisleri okunmaz (sorgu için gerekmez;
+        upsert / remove çağrılırsa dosyadan o an okunur). API worker'ları bunu kullanır.
+        """
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            g = cls.__new__(cls)
+            g.ids = z["ids"]
+            g.vectors = z["vectors"] if features else None
+            g.feats = z["feats"] if features else None
+            g.nbr_idx = z["nbr_idx"]
+            g.nbr_score = z["nbr_score"]
+            g.payloads = json.loads(str(z["payloads"]))
+        g.k = meta["k"]
+        g.weights = meta["weights"]
+        g._path = path
+        g._reindex()
+        return g
+
+
+# ============================
+# API: dosya değişince yeniden yükleme
+# ============================
+class NeighborGraphReloader:
+    """
+    build_neighbors (tam veya --ids ile artımlı) dosyayı güncellediğinde çalışan worker'lar
+    yeniden başlatılmadan yeni grafiği kullanır:
+    - En fazla check_interval saniyede bir dosyanın mtime'ına bakılır
+    - Değiştiyse features=False ile yüklenir ve atomik olarak değiştirilir
+    - Dosya silinirse / okunamazsa eldeki grafik kullanılmaya devam eder
+    """
+
+    def __init__(self, path: str, check_interval: float = 30.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.graph: Optional[NeighborGraph] = None
+        self._mtime: Optional[int] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[NeighborGraph]:
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self.reload()
+        return self.graph
+
+    def reload(self, force: bool = False) -> bool:
+        """Dosya değiştiyse (veya force) yükler; yüklendiyse True."""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return False
+            if mtime == self._mtime and not force:
+                return False
+            try:
+                graph = NeighborGraph.load(self.path, features=False)
+            except Exception as e:
+                logger.warning("Komşu grafiği yüklenemedi (%s): %s", self.path, e)
+                return False
+            self.graph, self._mtime = graph, mtime
+        logger.info("Komşu grafiği yüklendi: %d ilan", len(graph))
+        return True
@@ -10,9 +10,12 @@ Veri ön işleme ve normalize etme fonksiyonları
 """
 
 import re
-import pandas as pd
+from typing import TYPE_CHECKING
 from unidecode import unidecode
 
+if TYPE_CHECKING:  # pandas sadece normalize_df için gerekli; API import'unu hafif tut
+    import pandas as pd
+
 
 # ============================
 # Küçük harfe çevir + Türkçe karakterleri ASCII yap
@@ -60,7 +63,7 @@ def extract_city(konum: str) -> str:
 # ============================
 # Ana normalize fonksiyonu
 # ============================
-def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_df(df: "pd.DataFrame") -> "pd.DataFrame":
     """
     DataFrame içindeki kolonları normalize eder.
     - fiyat, kilometre, yıl → sayısal alan
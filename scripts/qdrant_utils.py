@@ -4,16 +4,14 @@ Qdrant yardımcı fonksiyonları
 - ID üretme
 - Arama metni oluşturma
 - Payload hazırlama
-- Koleksiyon oluşturma
+- Koleksiyon oluşturma (+ filtre alanları için payload index)
 - DataFrame → Qdrant upsert etme
 - QueryFilters modeli (LLM çıktısını tutmak için)
 - QueryFilters → Qdrant Filter dönüşümü (sadece sayısal alanlar: fiyat, yıl, km)
 """
 
 import uuid
-from typing import Any, Dict, Optional, List
-import pandas as pd
-from tqdm import tqdm
+from typing import TYPE_CHECKING, Any, Dict, Optional, List
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Distance,
@@ -22,11 +20,15 @@ from qdrant_client.models import (
     Filter,
     FieldCondition,
     Range,
+    PayloadSchemaType,
 )
 from pydantic import BaseModel
 
 from scripts.normalize import ascii_lower, extract_city
 
+if TYPE_CHECKING:  # pandas sadece yükleme (df_to_points) için gerekli
+    import pandas as pd
+
 
 # ============================
 # ID üretici
@@ -73,6 +75,17 @@ def build_payload(r: Dict[str, Any], text: str) -> Dict[str, Any]:
 # ============================
 # Koleksiyon kontrol/oluştur
 # ============================
+# Strict filtre + count() için indekslenen alanlar
+PAYLOAD_INDEXES = {
+    "marka_key": PayloadSchemaType.KEYWORD,
+    "seri_key": PayloadSchemaType.KEYWORD,
+    "model_key": PayloadSchemaType.KEYWORD,
+    "fiyat_num": PayloadSchemaType.FLOAT,
+    "yil_num": PayloadSchemaType.FLOAT,
+    "km_num": PayloadSchemaType.FLOAT,
+}
+
+
 def ensure_collection(client: QdrantClient, name: str, dim: int):
     existing = [c.name for c in client.get_collections().collections]
     if name not in existing:
@@ -80,18 +93,33 @@ def ensure_collection(client: QdrantClient, name: str, dim: int):
             collection_name=name,
             vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
         )
+    ensure_payload_indexes(client, name)
+
+
+def missing_payload_indexes(client: QdrantClient, name: str) -> List[str]:
+    """PAYLOAD_INDEXES'ten koleksiyonda henüz index'i olmayan alanlar (sadece okuma)."""
+    schema = client.get_collection(name).payload_schema or {}
+    return [field for field in PAYLOAD_INDEXES if field not in schema]
+
+
+def ensure_payload_indexes(client: QdrantClient, name: str):
+    """Filtrelenen alanlara payload index ekler (varsa dokunmaz)."""
+    for field in missing_payload_indexes(client, name):
+        client.create_payload_index(collection_name=name, field_name=field, field_schema=PAYLOAD_INDEXES[field])
 
 
 # ============================
 # DataFrame → Qdrant Upsert
 # ============================
 def df_to_points(
-    df: pd.DataFrame,
+    df: "pd.DataFrame",
     embedder,
     client: QdrantClient,
     collection: str,
     batch_size: int = 256,
 ):
+    from tqdm import tqdm
+
     ensure_collection(client, collection, embedder.dimension())
     rows = df.to_dict(orient="records")
 
@@ -161,9 +189,3 @@ def build_qdrant_filter(f: QueryFilters) -> Optional[Filter]:
 
     return Filter(must=must) if must else None
 
-
-client = QdrantClient("http://localhost:6333")
-
-# Koleksiyon adını kendi koleksiyonuna göre değiştir
-collection_name = "car_listings_st"
-
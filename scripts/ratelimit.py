@@ -0,0 +1,219 @@
+"""
+ratelimit.py
+LLM çağrıları için eşzamanlılık / hız kontrolü ve istek birleştirme
+- TokenBucket: saniyede rate istek, burst kadar ani yük
+- LLMLimiter: model başına semaphore + token bucket, 429'da jitter'lı yeniden deneme
+- LLMBudgetExceeded: bütçe (bekleme süresi / deneme sayısı) tükendi → çağıran degrade moda geçer
+- SingleFlight: aynı anda gelen özdeş istekler tek çalıştırmayı paylaşır
+
+Ayarlar (tüm modeller için ortak, bütçe model başınadır):
+    LLM_MAX_CONCURRENCY  aynı anda açık LLM çağrısı          (varsayılan 8)
+    LLM_RPS              saniyedeki çağrı hızı                (varsayılan 5)
+    LLM_BURST            ani yük kapasitesi                   (varsayılan 10)
+    LLM_MAX_WAIT         sıra + geri çekilme için toplam sn   (varsayılan 2.0)
+    LLM_MAX_RETRIES      429 sonrası yeniden deneme sayısı     (varsayılan 3)
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional
+
+from scripts.metrics import COALESCED, LLM_EVENTS
+
+
+class LLMBudgetExceeded(RuntimeError):
+    """LLM çağrısı bütçe içinde yapılamadı (kuyruk dolu, hız sınırı veya tekrarlanan 429)."""
+
+
+def is_rate_limited(e: BaseException) -> bool:
+    """openai.RateLimitError ve status_code=429 taşıyan diğer hatalar."""
+    return getattr(e, "status_code", None) == 429 or type(e).__name__ == "RateLimitError"
+
+
+def _retry_after(e: BaseException) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# ============================
+# Token bucket
+# ============================
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Bir token alır; deadline'a (monotonic) kadar alamazsa False."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+                self._t = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+# ============================
+# Model başına limiter
+# ============================
+class LLMLimiter:
+    def __init__(
+        self,
+        model: str,
+        max_concurrency: int = 8,
+        rate: float = 5.0,
+        burst: float = 10.0,
+        max_wait: float = 2.0,
+        max_retries: int = 3,
+        backoff: float = 0.25,
+    ):
+        self.model = model
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._sem = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate, burst)
+
+    def slot(self, deadline: Optional[float] = None) -> "_Slot":
+        """
+        Tek LLM çağrısı için izin (context manager): önce hız, sonra eşzamanlılık.
+        deadline'a kadar alınamazsa LLMBudgetExceeded.
+        """
+        return _Slot(self, deadline if deadline is not None else time.monotonic() + self.max_wait)
+
+    def backoff_sleep(self, attempt: int, err: BaseException, deadline: float):
+        """
+        429 sonrası bekleme: Retry-After varsa o, yoksa üstel geri çekilme + full jitter.
+        Deneme hakkı veya süre kalmadıysa LLMBudgetExceeded.
+        """
+        if attempt >= self.max_retries:
+            LLM_EVENTS.inc(model=self.model, event="budget_exceeded")
+            raise LLMBudgetExceeded(f"{self.model}: {attempt + 1} denemede 429") from err
+        delay = _retry_after(err) or random.uniform(0, self.backoff * 2 ** attempt)
+        if time.monotonic() + delay > deadline:
+            LLM_EVENTS.inc(model=self.model, event="budget_exceeded")
+            raise LLMBudgetExceeded(f"{self.model}: 429 sonrası bekleme bütçeyi aşıyor") from err
+        LLM_EVENTS.inc(model=self.model, event="retry_429")
+        time.sleep(delay)
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """fn'i limiter altında çağırır; 429'da yeniden dener."""
+        deadline = time.monotonic() + self.max_wait
+        attempt = 0
+        while True:
+            try:
+                with self.slot(deadline):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                self.backoff_sleep(attempt, e, deadline)
+                attempt += 1
+
+
+class _Slot:
+    __slots__ = ("limiter", "deadline")
+
+    def __init__(self, limiter: LLMLimiter, deadline: float):
+        self.limiter = limiter
+        self.deadline = deadline
+
+    def __enter__(self):
+        lim = self.limiter
+        if not lim._bucket.acquire(self.deadline):
+            LLM_EVENTS.inc(model=lim.model, event="rate_limited")
+            raise LLMBudgetExceeded(f"{lim.model}: hız sınırı")
+        if not lim._sem.acquire(timeout=max(0.0, self.deadline - time.monotonic())):
+            LLM_EVENTS.inc(model=lim.model, event="queue_full")
+            raise LLMBudgetExceeded(f"{lim.model}: eşzamanlılık sınırı")
+        return self
+
+    def __exit__(self, *exc):
+        self.limiter._sem.release()
+        return False
+
+
+_limiters: Dict[str, LLMLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> LLMLimiter:
+    """Model başına tek limiter (ayarlar ortam değişkenlerinden, ilk kullanımda okunur)."""
+    lim = _limiters.get(model)
+    if lim is None:
+        with _limiters_lock:
+            lim = _limiters.get(model)
+            if lim is None:
+                lim = _limiters[model] = LLMLimiter(
+                    model,
+                    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+                    rate=float(os.getenv("LLM_RPS", 5)),
+                    burst=float(os.getenv("LLM_BURST", 10)),
+                    max_wait=float(os.getenv("LLM_MAX_WAIT", 2.0)),
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", 3)),
+                )
+    return lim
+
+
+# ============================
+# Single-flight
+# ============================
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Aynı key ile eşzamanlı gelen çağrılardan sadece ilki fn'i çalıştırır;
+    diğerleri onun sonucunu (veya hatasını) paylaşır. Sonuç saklanmaz:
+    çağrı bittikten sonra gelen istek yeniden çalıştırır.
+    """
+
+    def __init__(self, name: str = "search"):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(name=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
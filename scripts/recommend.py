@@ -1,17 +1,19 @@
 # scripts/recommend.py
-import json
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 
+from scripts.compact import compact_candidates, expand_refs
+
 SYSTEM="""Aşağıdaki aday arabalar arasından kullanıcı niyetine en uygun 5 tanesini seç.
-Her aracı madde halinde yaz: Başlık | Yıl | Km | Fiyat | Yakıt/Vites | Şehir | [Link]"""
+Adaylar '|' ayraçlı bir tablodur, ilk satır kolon adlarıdır.
+Her aracı madde halinde yaz: Başlık | Yıl | Km | Fiyat | Yakıt/Vites | Şehir | [Link](ref)
+Link hedefi olarak adayın 'ref' kodunu (L1, L2, ...) aynen yaz."""
 
-prompt=ChatPromptTemplate.from_messages([("system",SYSTEM),("human","Sorgu: {query}\nAdaylar: {candidates}")])
+prompt=ChatPromptTemplate.from_messages([("system",SYSTEM),("human","Sorgu: {query}\nAdaylar:\n{candidates}")])
 
-def recommend_text(query, results, api_key, model="gpt-4o-mini"):
-    cands=[{"marka":pl.get("marka"),"seri":pl.get("seri"),"model":pl.get("model"),"yil":pl.get("yil"),
-            "km":pl.get("kilometre"),"fiyat":pl.get("fiyat"),"url":pl.get("url")} for _,_,pl in results[:20]]
+def recommend_text(query, results, api_key, model="gpt-4o-mini", max_tokens=800):
+    cands,refs=compact_candidates([pl for _,_,pl in results[:20]], max_tokens=max_tokens, model=model)
     llm=ChatOpenAI(api_key=api_key, model=model, temperature=0)
     chain=prompt|llm|StrOutputParser()
-    return chain.invoke({"query":query,"candidates":json.dumps(cands,ensure_ascii=False)})
+    return expand_refs(chain.invoke({"query":query,"candidates":cands}), refs)
@@ -2,72 +2,176 @@
 HybridSearcher (semantic ağırlıklı)
 - Kullanıcı sorgusunu embedding'e dönüştürür
 - Qdrant'ta arama yapar (dense + filtreler)
+- Çoklu sorguyu tek encode + tek Qdrant batch isteğiyle arar
+- Strict modda marka/seri/model isimleri (varsa) VocabIndex ile kanonik key'lere çözülür
 """
 
-from typing import List, Tuple, Optional
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple, Optional, Sequence, Union
 from qdrant_client import QdrantClient
-from qdrant_client.models import ScoredPoint, Filter, FieldCondition, MatchValue
+from qdrant_client.models import ScoredPoint, Filter, FieldCondition, MatchValue, QueryRequest
 
+from scripts.normalize import ascii_lower
 from scripts.qdrant_utils import QueryFilters, build_qdrant_filter
+from scripts.vocab import VocabReloader
+
+logger = logging.getLogger(__name__)
+
+
+COUNT_CACHE_TTL = 300.0   # sn; ilan kardinaliteleri yavaş değişir
+COUNT_CACHE_SIZE = 4096
 
 
 class HybridSearcher:
-    def __init__(self, client: QdrantClient, collection: str, embedder):
+    def __init__(self, client: QdrantClient, collection: str, embedder, vocab=None):
         """
         - client: QdrantClient örneği
         - collection: Qdrant koleksiyon adı
         - embedder: SentenceTransformer benzeri bir model
+        - vocab: opsiyonel VocabIndex / VocabReloader (yazım hatası / Türkçe karakter toleranslı key çözümleme)
         """
         self.client = client
         self.collection = collection
         self.embedder = embedder
+        self.vocab = vocab
+        self._count_cache: "OrderedDict[tuple, Tuple[int, float]]" = OrderedDict()
+        self._count_lock = threading.Lock()
 
-    def search(
-        self,
-        query: str,
-        f: Optional[QueryFilters] = None,
-        top_k: int = 10,
-        strict: bool = False
-    ) -> List[Tuple[str, float, dict]]:
+    def resolve_keys(self, f: QueryFilters) -> Tuple[Optional[str], Optional[str], Optional[str]]:
         """
-        Arama yap:
-        - query → embedding
-        - Qdrant search
-        - Sadece sayısal filtreler (fiyat / yıl / km)
-        - Eğer strict=True ise: marka/seri/model de filtrelenir
+        marka/seri/model → payload key'leri (marka_key / seri_key / model_key)
+        - vocab varsa: kanonik key'e çözülür (yazım hatası / ayraç / önek toleranslı)
+        - Sözlükte karşılığı olmayan alan (veya vocab yok / henüz yüklenmedi): indeksleme ile
+          aynı normalizasyon (ascii_lower). Sözlükten sonra eklenen bir marka yine eşleşir;
+          gerçekten olmayan bir isim 0 sonuç verir ve relaxed aramaya düşülür
+        vocab: VocabIndex veya get() ile güncel sözlüğü veren VocabReloader
         """
-        # 1) Query → embedding
-        query_vec = self.embedder.embed_query(query)
+        vals = (f.marka, f.seri, f.model)
+        vocab = self.vocab.get() if isinstance(self.vocab, VocabReloader) else self.vocab
+        resolved = vocab.resolve(*vals) if vocab is not None else (None, None, None)
+        return tuple(r or (ascii_lower(v) if v else None) for r, v in zip(resolved, vals))
 
-        # 2) Sayısal filtreleri hazırla
+    def build_filter(self, f: Optional[QueryFilters], strict: bool = False) -> Optional[Filter]:
+        """
+        QueryFilters → Qdrant Filter
+        - Sadece sayısal filtreler (fiyat / yıl / km)
+        - Eğer strict=True ise: marka/seri/model de filtrelenir (resolve_keys ile)
+        """
+        # 1) Sayısal filtreleri hazırla
         qdrant_filter = build_qdrant_filter(f) if f else None
 
-        # 3) Eğer strict=True → marka/seri/model de ekle
+        # 2) Eğer strict=True → marka/seri/model de ekle
         if f and strict:
             must = qdrant_filter.must if qdrant_filter else []
 
-            def eq(field: str, val: Optional[str]):
+            for field, val in zip(("marka_key", "seri_key", "model_key"), self.resolve_keys(f)):
                 if val:
-                    must.append(FieldCondition(key=field, match=MatchValue(value=val.lower().strip())))
-
-            eq("marka_key", f.marka)
-            eq("seri_key", f.seri)
-            eq("model_key", f.model)
+                    must.append(FieldCondition(key=field, match=MatchValue(value=val)))
 
             qdrant_filter = Filter(must=must) if must else None
 
         if f:
-            print("📌 Uygulanan filtreler:", f.model_dump())
+            logger.debug("Uygulanan filtreler: %s", f.model_dump(exclude_none=True))
         if qdrant_filter:
-            print("✅ Qdrant filtresi aktif")
+            logger.debug("Qdrant filtresi aktif (strict=%s)", strict)
+        return qdrant_filter
+
+    def count(self, f: Optional[QueryFilters], strict: bool = False, exact: bool = False) -> int:
+        """
+        Filtreye uyan ilan sayısı (vektör araması yapmadan).
+        exact=False → Qdrant payload index'lerinden kardinalite tahmini (ucuz).
+        Sonuçlar COUNT_CACHE_TTL boyunca filtre bazında (LRU) saklanır.
+        """
+        qdrant_filter = self.build_filter(f, strict)
+        key = (qdrant_filter.model_dump_json() if qdrant_filter else None, exact)
+        now = time.monotonic()
+
+        with self._count_lock:
+            hit = self._count_cache.get(key)
+            if hit is not None and now - hit[1] < COUNT_CACHE_TTL:
+                self._count_cache.move_to_end(key)
+                return hit[0]
+
+        n = self.client.count(
+            collection_name=self.collection,
+            count_filter=qdrant_filter,
+            exact=exact,
+        ).count
+
+        with self._count_lock:
+            self._count_cache[key] = (n, now)
+            self._count_cache.move_to_end(key)
+            while len(self._count_cache) > COUNT_CACHE_SIZE:
+                self._count_cache.popitem(last=False)
+        return n
 
-        # 4) Qdrant search
-        res: List[ScoredPoint] = self.client.search(
+    def search(
+        self,
+        query: str,
+        f: Optional[QueryFilters] = None,
+        top_k: int = 10,
+        strict: bool = False,
+        query_vec: Optional[Sequence[float]] = None,
+    ) -> List[Tuple[str, float, dict]]:
+        """
+        Arama yap:
+        - query → embedding (query_vec verildiyse tekrar encode edilmez)
+        - Qdrant search (filtreler: build_filter)
+        """
+        # 1) Query → embedding
+        if query_vec is None:
+            query_vec = self.embedder.embed_query(query)
+
+        # 2) Filtre
+        qdrant_filter = self.build_filter(f, strict)
+
+        # 3) Qdrant search (query_points: qdrant-client ≥1.10; eski search() kaldırıldı)
+        res: List[ScoredPoint] = self.client.query_points(
             collection_name=self.collection,
-            query_vector=query_vec,
+            query=query_vec,
             query_filter=qdrant_filter,
             limit=top_k,
-        )
+            with_payload=True,
+        ).points
 
-        # 5) (id, skor, payload) döndür
+        # 4) (id, skor, payload) döndür
         return [(str(p.id), p.score, p.payload) for p in res]
+
+    def search_batch(
+        self,
+        queries: Sequence[str],
+        filters: Optional[Sequence[Optional[QueryFilters]]] = None,
+        top_k: Union[int, Sequence[int]] = 10,
+        strict: Union[bool, Sequence[bool]] = False,
+        query_vecs: Optional[Sequence[Sequence[float]]] = None,
+    ) -> List[List[Tuple[str, float, dict]]]:
+        """
+        Birden fazla sorguyu tek seferde ara:
+        - Tüm sorgular TEK encode çağrısıyla embedding'e çevrilir (query_vecs verilmediyse)
+        - Her sorgunun kendi filtresi, strict ayarı ve top_k'sı olabilir
+        - Qdrant'a TEK query_batch_points isteği gider
+        Sonuçlar sorgu sırasıyla, her biri search() ile aynı formatta döner.
+        """
+        n = len(queries)
+        if n == 0:
+            return []
+        filters = list(filters) if filters is not None else [None] * n
+        stricts = [strict] * n if isinstance(strict, bool) else list(strict)
+        top_ks = [top_k] * n if isinstance(top_k, int) else list(top_k)
+
+        # 1) Tek encode
+        if query_vecs is None:
+            query_vecs = self.embedder.embed_documents(list(queries))
+
+        # 2) Tek batch istek
+        requests = [
+            QueryRequest(query=list(vec), filter=self.build_filter(f, s), limit=k, with_payload=True)
+            for vec, f, s, k in zip(query_vecs, filters, stricts, top_ks)
+        ]
+        responses = self.client.query_batch_points(collection_name=self.collection, requests=requests)
+
+        # 3) (id, skor, payload) listeleri
+        return [[(str(p.id), p.score, p.payload) for p in r.points] for r in responses]
@@ -0,0 +1,245 @@
+"""
+session_store.py
+Sunucu tarafı sohbet durumu (session) deposu
+- Her tur için sorgu embedding'i ve çözümlenmiş QueryFilters saklanır
+- Konu algılama: yeni sorgu vektörü × saklı embedding matrisi (tek matris-vektör çarpımı)
+- Filtre çıkarımı: sadece yeni mesaj LLM'e gider, sonuç saklı filtrelerle birleştirilir
+- Backend'ler: bellek içi (LRU + TTL), SQLite, Redis
+- update(): okuma → değiştirme → yazma her backend'de atomik (aynı session'a eşzamanlı iki tur
+  birbirini ezmez): bellek içi process kilidi, SQLite BEGIN IMMEDIATE, Redis WATCH/MULTI
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from scripts.qdrant_utils import QueryFilters
+
+
+DEFAULT_TTL = 60 * 60          # 1 saat
+DEFAULT_MAX_SESSIONS = 10_000
+HISTORY_TAKE = 3               # konu algılamada bakılan son tur sayısı (api.main de bunu kullanır)
+LOCK_STRIPES = 64
+SWEEP_INTERVAL = 60.0          # sn; SQLite'ta süresi dolan session'ları silme aralığı
+
+
+# ============================
+# Session durumu
+# ============================
+class SessionState(BaseModel):
+    embeddings: List[List[float]] = Field(default_factory=list)  # son HISTORY_TAKE tur (normalize)
+    filters: Optional[QueryFilters] = None                       # son çözümlenmiş filtreler
+    updated_at: float = Field(default_factory=time.time)
+
+    def max_similarity(self, q_emb) -> Optional[float]:
+        """Sorgu vektörünün saklı turlara en yüksek kosinüs benzerliği (embedding'ler normalize)."""
+        if not self.embeddings:
+            return None
+        return float(np.max(np.asarray(self.embeddings, dtype=np.float32) @ np.asarray(q_emb, dtype=np.float32)))
+
+    def add_turn(self, q_emb, filters: QueryFilters, max_turns: int = HISTORY_TAKE):
+        self.embeddings = (self.embeddings + [list(map(float, q_emb))])[-max_turns:]
+        self.filters = filters
+        self.updated_at = time.time()
+
+    def reset(self):
+        self.embeddings = []
+        self.filters = None
+
+
+# ============================
+# Depo arayüzü
+# ============================
+class SessionStore(ABC):
+    """
+    Backend'lerin uyguladığı ortak arayüz.
+    get() her zaman bağımsız bir kopya döndürür; değişiklikler put() veya update() ile yazılır.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionState]:
+        ...
+
+    @abstractmethod
+    def put(self, session_id: str, state: SessionState):
+        ...
+
+    @abstractmethod
+    def update(self, session_id: str, fn: Callable[[SessionState], None]) -> SessionState:
+        """
+        Session'ı atomik olarak günceller: mevcut durum (yoksa boş SessionState) okunur,
+        fn yerinde değiştirir, sonuç yazılır ve döner. Aynı session'a eşzamanlı update'ler
+        (backend paylaşımlıysa farklı worker'lardan da) sıraya girer.
+        fn kısa olmalı (LLM / embedding çağrısı yok) ve yeniden çağrılabilir olmalı.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+
+class InMemorySessionStore(SessionStore):
+    """Tek process içi LRU + TTL depo (varsayılan)."""
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, ttl: float = DEFAULT_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._data: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._session_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            state = self._data.get(session_id)
+            if state is None:
+                return None
+            if time.time() - state.updated_at > self.ttl:
+                del self._data[session_id]
+                return None
+            self._data.move_to_end(session_id)
+            return state.model_copy(deep=True)
+
+    def put(self, session_id: str, state: SessionState):
+        state = state.model_copy(deep=True)
+        with self._lock:
+            self._data[session_id] = state
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def update(self, session_id: str, fn: Callable[[SessionState], None]) -> SessionState:
+        # get / put kendi kilitlerini alır; session kilidi sadece aynı session'ı sıraya sokar
+        with self._session_locks[hash(session_id) % LOCK_STRIPES]:
+            state = self.get(session_id) or SessionState()
+            fn(state)
+            self.put(session_id, state)
+        return state
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Birden fazla worker'ın paylaşabileceği SQLite depo.
+    update() BEGIN IMMEDIATE ile yazma kilidini baştan alır → worker'lar arası da sıralıdır.
+    Süresi dolan kayıtlar en fazla SWEEP_INTERVAL saniyede bir (updated_at index'iyle) silinir.
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, timeout: float = 5.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._swept = 0.0
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def _read(self, session_id: str) -> Optional[SessionState]:
+        row = self._conn.execute(
+            "SELECT data, updated_at FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return SessionState.model_validate_json(row[0])
+
+    def _write(self, session_id: str, state: SessionState):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+            (session_id, state.model_dump_json(), state.updated_at),
+        )
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._swept >= SWEEP_INTERVAL:
+            self._swept = now
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            return self._read(session_id)
+
+    def put(self, session_id: str, state: SessionState):
+        with self._lock:
+            self._write(session_id, state)
+            self._maybe_sweep()
+
+    def update(self, session_id: str, fn: Callable[[SessionState], None]) -> SessionState:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                state = self._read(session_id) or SessionState()
+                fn(state)
+                self._write(session_id, state)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._maybe_sweep()
+        return state
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+class RedisSessionStore(SessionStore):
+    """Redis depo (TTL Redis'e bırakılır). `redis` paketi gerekir."""
+
+    def __init__(self, url: str, ttl: float = DEFAULT_TTL, prefix: str = "session:"):
+        import redis
+
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._r = redis.Redis.from_url(url)
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        raw = self._r.get(self.prefix + session_id)
+        return SessionState.model_validate_json(raw) if raw else None
+
+    def put(self, session_id: str, state: SessionState):
+        self._r.setex(self.prefix + session_id, self.ttl, state.model_dump_json())
+
+    def update(self, session_id: str, fn: Callable[[SessionState], None]) -> SessionState:
+        """WATCH / MULTI: araya başka bir yazma girerse işlem baştan (taze okumayla) tekrarlanır."""
+        key = self.prefix + session_id
+
+        def tx(pipe) -> SessionState:
+            raw = pipe.get(key)
+            state = SessionState.model_validate_json(raw) if raw else SessionState()
+            fn(state)
+            pipe.multi()
+            pipe.setex(key, self.ttl, state.model_dump_json())
+            return state
+
+        return self._r.transaction(tx, key, value_from_callable=True)
+
+    def delete(self, session_id: str):
+        self._r.delete(self.prefix + session_id)
+
+
+# ============================
+# Fabrika
+# ============================
+def make_session_store(url: Optional[str] = None, ttl: float = DEFAULT_TTL) -> SessionStore:
+    """
+    - None / "memory"            → InMemorySessionStore
+    - "sqlite:///sessions.db"    → SQLiteSessionStore
+    - "redis://localhost:6379/0" → RedisSessionStore
+    """
+    if not url or url == "memory":
+        return InMemorySessionStore(ttl=ttl)
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):], ttl=ttl)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisSessionStore(url, ttl=ttl)
+    raise ValueError(f"Desteklenmeyen session store adresi: {url}")
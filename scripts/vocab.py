@@ -0,0 +1,241 @@
+"""
+vocab.py
+Marka / seri / model isimlerini kanonik payload key'lerine çözümleme
+- Sözlük, Qdrant'taki indekslenmiş key alanlarından (marka_key, seri_key, model_key) kurulur
+- Türkçe karakterler ascii_lower ile katlanır ("Şahin" → "sahin")
+- Boşluk / tire farkları yok sayılır ("C-HR" → "c-hr", "chr" → "c-hr")
+- Trie ile tekil önek tamamlama ("astr" → "astra")
+- Trigram + edit distance ile yazım hatası toleransı ("fokus" → "focus")
+- Önek / bulanık eşleşmede sayı dizileri birebir aynı olmalı: "5 serisi" ↛ "3 serisi",
+  "2008" ↛ "3008", "208" ↛ "308" (farklı sayı = farklı model)
+- Seri marka içinde, model marka+seri içinde çözülür; kapsamda yoksa tüm sözlükte aranır
+- API tarafı sözlüğü periyodik olarak (arka planda) koleksiyondan yeniden kurar: VocabReloader
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from scripts.normalize import ascii_lower
+
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("marka_key", "seri_key", "model_key")
+MAX_CANDIDATES = 20
+
+
+def _compact(s: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", s)
+
+
+def _digits(s: str) -> Tuple[str, ...]:
+    return tuple(re.findall(r"\d+", s))
+
+
+def _trigrams(s: str) -> set:
+    s = f"  {s} "
+    return {s[i : i + 3] for i in range(len(s) - 2)}
+
+
+def _max_dist(n: int) -> int:
+    return 0 if n <= 2 else 1 if n <= 5 else 2
+
+
+def levenshtein(a: str, b: str, limit: int) -> int:
+    """limit'i aşınca erken çıkan edit distance (aşarsa limit + 1 döner)."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            row_min = min(row_min, cur[j])
+        if row_min > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+# ============================
+# Trie (tekil önek tamamlama)
+# ============================
+class _Trie:
+    __slots__ = ("root",)
+
+    def __init__(self):
+        self.root: dict = {}
+
+    def insert(self, word: str, key: str):
+        node = self.root
+        for ch in word:
+            node = node.setdefault(ch, {})
+            # "#": bu önek altındaki tek key (birden fazlaysa None)
+            node["#"] = key if node.get("#", key) == key else None
+
+    def complete(self, prefix: str) -> Optional[str]:
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node.get("#")
+
+
+# ============================
+# Tek alan sözlüğü
+# ============================
+class _FieldIndex:
+    def __init__(self, keys: Iterable[str]):
+        self.keys = set(k for k in keys if k)
+        self.compact: Dict[str, str] = {}
+        self.trie = _Trie()
+        self.grams: Dict[str, List[str]] = defaultdict(list)
+        for k in self.keys:
+            c = _compact(k)
+            self.compact.setdefault(c, k)
+            self.trie.insert(c, k)
+            for g in _trigrams(c):
+                self.grams[g].append(k)
+
+    def resolve(self, q: str) -> Optional[str]:
+        if q in self.keys:
+            return q
+        c = _compact(q)
+        if not c:
+            return None
+        if c in self.compact:
+            return self.compact[c]
+
+        digits = _digits(q)
+        hit = self.trie.complete(c) if len(c) >= 3 else None
+        if hit and _digits(hit) == digits:
+            return hit
+
+        # Trigram adayları → edit distance
+        limit = _max_dist(len(c))
+        if limit == 0:
+            return None
+        shared: Dict[str, int] = defaultdict(int)
+        for g in _trigrams(c):
+            for k in self.grams.get(g, ()):
+                shared[k] += 1
+        best: Optional[Tuple[int, int, str]] = None
+        cands = [(k, n) for k, n in shared.items() if _digits(k) == digits]
+        for k, n in sorted(cands, key=lambda kv: -kv[1])[:MAX_CANDIDATES]:
+            d = levenshtein(c, _compact(k), limit)
+            if d <= limit and (best is None or (d, -n) < best[:2]):
+                best = (d, -n, k)
+        return best[2] if best else None
+
+
+# ============================
+# Marka / seri / model sözlüğü
+# ============================
+class VocabIndex:
+    def __init__(self, rows: Iterable[Tuple[str, str, str]]):
+        """rows: (marka_key, seri_key, model_key) üçlüleri."""
+        marka, seri, model = set(), set(), set()
+        seri_by_marka, model_by_seri = defaultdict(set), defaultdict(set)
+        for m, s, md in rows:
+            marka.add(m)
+            seri.add(s)
+            model.add(md)
+            seri_by_marka[m].add(s)
+            model_by_seri[(m, s)].add(md)
+
+        self.marka = _FieldIndex(marka)
+        self.seri = _FieldIndex(seri)
+        self.model = _FieldIndex(model)
+        self._seri_by_marka = {m: _FieldIndex(v) for m, v in seri_by_marka.items()}
+        self._model_by_seri = {k: _FieldIndex(v) for k, v in model_by_seri.items()}
+
+    def __len__(self):
+        return len(self.marka.keys) + len(self.seri.keys) + len(self.model.keys)
+
+    @classmethod
+    def from_qdrant(cls, client, collection: str, batch: int = 2048) -> "VocabIndex":
+        """Koleksiyondaki key alanlarını (sadece payload, vektörsüz) okuyarak sözlük kurar."""
+        rows = set()
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection, limit=batch, offset=offset,
+                with_payload=list(FIELDS), with_vectors=False,
+            )
+            for p in points:
+                pl = p.payload or {}
+                rows.add(tuple(pl.get(f) or "" for f in FIELDS))
+            if offset is None:
+                return cls(rows)
+
+    def resolve(
+        self, marka: Optional[str], seri: Optional[str] = None, model: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        LLM'in çıkardığı isimleri kanonik key'lere çevirir.
+        Çözülemeyen (sözlükte karşılığı olmayan) alanlar None döner.
+        """
+        m = self.marka.resolve(ascii_lower(marka)) if marka else None
+
+        s = None
+        if seri:
+            q = ascii_lower(seri)
+            scoped = self._seri_by_marka.get(m) if m else None
+            s = (scoped.resolve(q) if scoped else None) or self.seri.resolve(q)
+
+        md = None
+        if model:
+            q = ascii_lower(model)
+            scoped = self._model_by_seri.get((m, s)) if m and s else None
+            md = (scoped.resolve(q) if scoped else None) or self.model.resolve(q)
+
+        return m, s, md
+
+
+# ============================
+# API: periyodik yeniden kurma
+# ============================
+class VocabReloader:
+    """
+    Worker başladıktan sonra koleksiyona eklenen marka / seri / modeller de çözülsün diye
+    sözlük en fazla refresh_interval saniyede bir yeniden kurulur:
+    - İlk yükleme reload() ile (warm-up); sonrakiler get() içinde tetiklenen arka plan thread'inde,
+      istekler bu sırada eldeki sözlüğü kullanır
+    - Yükleme başarısız olursa eldeki sözlük (veya None) kalır, sonraki aralıkta tekrar denenir
+    """
+
+    def __init__(self, client, collection: str, refresh_interval: float = 600.0):
+        self.client = client
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.index: Optional[VocabIndex] = None
+        self._loaded = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[VocabIndex]:
+        if time.monotonic() - self._loaded >= self.refresh_interval and not self._lock.locked():
+            threading.Thread(target=self.reload, name="vocab-reload", daemon=True).start()
+        return self.index
+
+    def reload(self) -> bool:
+        """Sözlüğü koleksiyondan yeniden kurar; başarılıysa True (eşzamanlı ikinci çağrı beklemez)."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._loaded = time.monotonic()
+            try:
+                index = VocabIndex.from_qdrant(self.client, self.collection)
+            except Exception as e:
+                logger.warning("Sözlük yüklenemedi (%s): %s", self.collection, e)
+                return False
+            self.index = index
+        finally:
+            self._lock.release()
+        logger.info("Sözlük yüklendi: %d key", len(index))
+        return True
@@ -3,11 +3,16 @@ import requests
 import sys
 import os
 import importlib.util
+import uuid
 
 # --- Proje kökü ve formatter.py yolu ---
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 FORMATTER_PATH = os.path.join(PROJECT_ROOT, "scripts", "formatter.py")
 
+# formatter.py, scripts.* modüllerini import ettiği için proje kökü path'te olmalı
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
 # --- .env yükle (opsiyonel ama faydalı) ---
 try:
     from dotenv import load_dotenv, find_dotenv
@@ -44,6 +49,9 @@ st.markdown("Merhaba! Sana en uygun aracı bulmana yardımcı olabilirim. 😊")
 # ===========================
 # Sohbet Geçmişi
 # ===========================
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = str(uuid.uuid4())
+
 if "messages" not in st.session_state:
     st.session_state["messages"] = [
         {"role": "assistant", "content": "Hoş geldin! Bana bütçeni, istediğin aracı ya da özellikleri sorabilirsin."}
@@ -62,13 +70,13 @@ if query := st.chat_input("Bir şey yaz..."):
     st.session_state["messages"].append({"role": "user", "content": query})
     st.chat_message("user").markdown(query)
 
-    # Son 3 kullanıcı mesajını history olarak gönder
+    # Sunucu session_id ile geçmişi kendisi tutar; history eski API sürümleri için gönderilir
     history = [m["content"] for m in st.session_state["messages"] if m["role"] == "user"][-3:]
 
     # FastAPI çağrısı
     try:
         with st.spinner("Aranıyor..."):
-            resp = requests.post(API_URL, json={"query": query, "history": history}, timeout=30)
+            resp = requests.post(API_URL, json={"query": query, "history": history, "session_id": st.session_state["session_id"]}, timeout=30)
             resp.raise_for_status()
             cars = resp.json()
     except Exception as e: